@@ -3,23 +3,177 @@
 """Everyday use functions for file handling."""
 
 import os
+import io
 import sys
-from pathlib import Path
+from pathlib import Path, PurePath
 import numpy as np
 import datetime
 from copy import deepcopy
 import collections
-from .interact import query
+from .interact import query, is_linux
 import json
 from detect_delimiter import detect
 # %%
 import warnings
 import re
+import hashlib
+import itertools
+import concurrent.futures
+import zipfile
+import fnmatch
+import time
+import stat
+import mmap
+import locale
+import sqlite3
+import gzip
+import bz2
+import lzma
+import asyncio
+import functools
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ModuleNotFoundError:
+    INotify = None
+
+try:
+    from compression import zstd  # python >= 3.14
+except ModuleNotFoundError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+try:
+    import h5py
+except ModuleNotFoundError:
+    h5py = None
 # %%
 
-def rename_files(filelist, pattern, new_pattern, ask=True):
+cache_max_size = 4*1024**3
+"""Maximum size in bytes of a cache directory used by :py:func:`load_data`."""
+
+binary_extensions = ('.npy', '.npz')
+"""File extensions saved/loaded in binary format by :py:func:`save_data` and :py:func:`load_data`."""
+
+hdf5_extensions = ('.h5', '.hdf5', '.hdf')
+"""File extensions saved/loaded in HDF5 format by :py:func:`save_data` and :py:func:`load_data` (requires h5py)."""
+
+compression_extensions = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zst': 'zstd'}
+"""File extensions of compressed text files and their compression format.
+
+Text files are transparently (de)compressed by :py:func:`save_text`,
+:py:func:`load_text`, :py:func:`save_data`, :py:func:`load_data`, and the
+other functions of this module. Files are also recognized as compressed by
+their first bytes, whatever the extension. zstd requires python >= 3.14 or
+the `backports.zstd <https://pypi.org/project/backports.zstd/>`_ package.
+"""
+
+_compression_magic = re.compile(rb'(?P<gzip>\x1f\x8b)|(?P<xz>\xfd7zXZ\x00)|(?P<zstd>\x28\xb5\x2f\xfd)|(?P<bz2>BZh[1-9](?:1AY&SY|\x17rE8P\x90))')
+
+
+def _compression(filepath, mode='r'):
+    """Return the compression format of a file (None if not compressed).
+
+    The format is given by the file extension (see ``compression_extensions``).
+    When reading, files with other extensions are checked by their first bytes.
+    """
+    compression = compression_extensions.get(os.path.splitext(filepath)[1].lower())
+    if compression is None and 'r' in mode:
+        try:
+            with open(filepath, 'rb') as file:
+                match = _compression_magic.match(file.read(10))
+        except OSError:  # error is raised when file is opened
+            return None
+        if match:
+            compression = match.lastgroup
+    return compression
+
+
+def _open(filepath, mode='r', compresslevel=None, compression='auto', **kwargs):
+    """Open a file, which is (de)compressed on the fly if needed.
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        mode (str, optional): 'r', 'w', or 'a' for text mode, or 'rb', 'wb',
+            or 'ab' for binary mode.
+        compresslevel (int, optional): compression level when writing
+            compressed files. If None, the default level of each format is used.
+        compression (str, optional): compression format (see
+            ``compression_extensions``), or None for uncompressed files. If
+            'auto', it is given by :py:func:`_compression`.
+        **kwargs: arguments passed to ``open()`` for uncompressed files.
+
+    Returns:
+        file object.
+    """
+    if compression == 'auto':
+        compression = _compression(filepath, mode)
+    if compression is None:
+        return open(filepath, mode, **kwargs)
+
+    if 'b' not in mode:
+        mode += 't'
+    options = {}
+    if compresslevel is not None and 'r' not in mode:
+        options = {'preset': compresslevel} if compression == 'xz' else {'compresslevel': compresslevel}
+
+    if compression == 'gzip':
+        return gzip.open(filepath, mode, **options)
+    elif compression == 'bz2':
+        return bz2.open(filepath, mode, **options)
+    elif compression == 'xz':
+        return lzma.open(filepath, mode, **options)
+    else:
+        if zstd is None:
+            raise ModuleNotFoundError('zstd compressed files require python >= 3.14 or the backports.zstd package (pip install backports.zstd).')
+        if options:
+            options = {'level': compresslevel}
+        return zstd.open(filepath, mode, **options)
+
+
+def _lines(file, size=2**20):
+    """Return an iterator over the lines of an open text file.
+
+    Iterating over a compressed file is slow (about 3x the decompression
+    time), so lines of compressed files are split from large decompressed
+    blocks instead.
+
+    Args:
+        file (file object): text file opened for reading.
+        size (int, optional): number of characters read at once.
+
+    Returns:
+        iterator.
+    """
+    compressed = (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile) + ((zstd.ZstdFile, ) if zstd is not None else ())
+    if not isinstance(getattr(file, 'buffer', None), compressed):
+        return file
+    return _split_lines(file, size)
+
+
+def _split_lines(file, size):
+    """Yield lines of a text file that is read in blocks of size characters."""
+    rest = ''
+    for block in iter(lambda: file.read(size), ''):
+        lines = io.StringIO(rest + block).readlines()
+        rest = lines.pop() if not lines[-1].endswith('\n') else ''
+        yield from lines
+    if rest:
+        yield rest
+
+
+def rename_files(filelist, pattern, new_pattern, ask=True, max_workers=8):
     """Change the filename pattern of files.
 
+    All new names are computed before renaming any file. Files that do not
+    match the pattern, two files with the same new name, or new names of
+    files that already exist (and are not renamed) raise an error before
+    anything is renamed. Chains and cycles of names (e.g., swapping two
+    filenames) are allowed. If a rename fails, files that were already
+    renamed are renamed back.
+
     Args:
         filelist (list): list of filepaths (string or pathlib.Path object).
         pattern (str): string that represents the filename pattern. Use ``{}`` to collect values within the file name.
@@ -38,75 +192,199 @@ def rename_files(filelist, pattern, new_pattern, ask=True):
                 Use ``{n}`` in ``new_pattern`` to inlcude the filenane index number (index regarding filelist).
 
         ask (bool): If true, it shows all the new filenames and asks for permission to rename.
+        max_workers (int, optional): number of threads renaming files in parallel.
     """
-    permission = True
-    n_infos = pattern.count('{}')
-    pattern = pattern.replace('{}', '(.+?)')
-
-    new_pattern = new_pattern.replace('{n}', '[n]')
-
-    a = re.findall('{.+?}', new_pattern)
-    a = [int(item.replace('{', '').replace('}', '')) for item in a]
-    if n_infos < max(a)+1:
-        raise AttributeError("new_pattern has some {n} where n is bigger than the number of marked infos {} in pattern.")
+    plan = _rename_plan(filelist, pattern, new_pattern)
 
+    permission = True
     if ask:
         permission = False
         print('\n' + '='*20)
         print('The following files will be renamed:\n')
 
-        for n, filePath in enumerate(filelist):
-            filePath = Path(filePath)
-
-            # new name
-            a = re.search(pattern, filePath.name)
-            a = [a.group(i) for i in range(1, n_infos+1)]
-
-            newPattern_mod_1 = new_pattern.replace('[n]', str(n))
-            newPattern_mod_2 = newPattern_mod_1.replace("{", "{a[").replace("}", "]}")
-            nameNew = eval("f'"+ newPattern_mod_2 + "'")
-
-            # print('\n' + '='*20)
-            # print('The following files will be renamed:\n')
-            print('OLD NAME = ' + filePath.name)
-            print('NEW NAME = ' + nameNew)
+        for filepath, new_filepath in plan:
+            print('OLD NAME = ' + os.path.basename(filepath))
+            print('NEW NAME = ' + os.path.basename(new_filepath))
             print('--')
 
         permission = query('Change names?', default="yes")
 
-
     if permission:
-        for n, filePath in enumerate(filelist):
-            filePath = Path(filePath)
+        _execute_renames(plan, max_workers=max_workers)
+        print('Files renamed!')
+    else:
+        warnings.warn('Files NOT renamed.')
 
-            # new name
-            a = re.search(pattern, filePath.name)
-            a = [a.group(i) for i in range(1, n_infos+1)]
 
-            newPattern_mod_1 = new_pattern.replace('[n]', str(n))
-            newPattern_mod_2 = newPattern_mod_1.replace("{", "{a[").replace("}", "]}")
-            nameNew = eval("f'"+ newPattern_mod_2 + "'")
+def _rename_plan(filelist, pattern, new_pattern):
+    """Return list of (filepath, new filepath) for :py:func:`rename_files`.
 
-            filePath.rename(filePath.parent / nameNew)
+    Filepaths are absolute paths (str). Files that keep the same name are
+    not included.
 
-        print('Files renamed!')
-    else:
-        warnings.warn('Files NOT renamed.')
+    Raises:
+        ValueError: if a file does not match pattern, or new filepaths collide.
+    """
+    n_infos = pattern.count('{}')
+    regex = re.compile(pattern.replace('{}', '(.+?)'))
+
+    a = re.findall('{.+?}', new_pattern.replace('{n}', ''))
+    a = [int(item.replace('{', '').replace('}', '')) for item in a]
+    if n_infos < max(a, default=-1)+1:
+        raise AttributeError("new_pattern has some {n} where n is bigger than the number of marked infos {} in pattern.")
 
+    plan = []
+    not_matched = []
+    parents = {}
+    for n, filepath in enumerate(filelist):
+        parent, name = os.path.split(os.fspath(filepath))
+        match = regex.search(name)
+        if match is None:
+            not_matched.append(name)
+            continue
+        if parent not in parents:
+            parents[parent] = os.path.abspath(parent)
+        parent = parents[parent]
+        plan.append((os.path.join(parent, name), os.path.join(parent, new_pattern.format(*match.groups(), n=n))))
+    if not_matched:
+        raise ValueError(f'{len(not_matched)} file(s) do not match pattern: {not_matched[:10]}')
+
+    # collisions
+    sources = {filepath for filepath, _ in plan}
+    renamed_by = {}
+    listdirs = {}
+    for filepath, new_filepath in plan:
+        if new_filepath in renamed_by:
+            raise ValueError(f'{os.path.basename(renamed_by[new_filepath])} and {os.path.basename(filepath)} would be both renamed to {os.path.basename(new_filepath)}')
+        renamed_by[new_filepath] = filepath
+        if new_filepath not in sources:
+            parent, name = os.path.split(new_filepath)
+            if parent not in listdirs:
+                listdirs[parent] = set(os.listdir(parent))
+            if name in listdirs[parent]:
+                raise ValueError(f'{os.path.basename(filepath)} cannot be renamed to {name}. File already exists.')
+
+    return [(filepath, new_filepath) for filepath, new_filepath in plan if filepath != new_filepath]
+
+
+def _execute_renames(plan, max_workers=8):
+    """Rename files in parallel. Completed renames are undone if one rename fails.
 
-def rmdir(dirpath):
+    Args:
+        plan (list): list of (filepath, new filepath).
+        max_workers (int, optional): number of threads.
+    """
+    # if a new name is also an old name (chains and cycles), files are first
+    # renamed to temporary names
+    sources = {filepath for filepath, _ in plan}
+    if any(new_filepath in sources for _, new_filepath in plan):
+        tag = f'{os.getpid()}_{time.time_ns()}'
+        temporary = [os.path.join(os.path.dirname(filepath), f'.{os.path.basename(filepath)}.renaming_{tag}') for filepath, _ in plan]
+        steps = [list(zip([filepath for filepath, _ in plan], temporary)),
+                 list(zip(temporary, [new_filepath for _, new_filepath in plan]))]
+    else:
+        steps = [plan]
+
+    # journal of completed renames
+    journal = []
+    def rename(batch):
+        for filepath, new_filepath in batch:
+            os.rename(filepath, new_filepath)
+            journal.append((filepath, new_filepath))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for step in steps:
+            futures = [executor.submit(rename, step[i::max_workers]) for i in range(max_workers)]
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                for filepath, new_filepath in reversed(journal):
+                    os.rename(new_filepath, filepath)
+                raise errors[0]
+
+
+def rmdir(dirpath, max_workers=8, verbose=False):
     """Remove a directory and everyting in it.
 
+    The directory tree is walked with ``os.scandir`` (no recursion limit) and
+    files are removed by a pool of threads. Errors do not stop the removal,
+    they are returned (and a warning is raised) at the end. Symbolic links
+    are removed, but not followed.
+
     Args:
         dirpath (string or pathlib.Path): directory path.
+        max_workers (int, optional): number of threads removing files.
+        verbose (bool, optional): if True, progress is printed.
+
+    Returns:
+        dictionary ``{path: exception}`` with paths that could not be removed
+        (empty if everything was removed).
     """
-    dirpath = Path(dirpath)
-    for item in dirpath.iterdir():
-        if item.is_dir():
-            rmdir(item)
-        else:
-            item.unlink()
-    dirpath.rmdir()
+    dirpath = os.fspath(dirpath)
+    errors = {}
+    n_removed = 0
+    last_print = time.monotonic()
+
+    def unlink(batch):
+        failed = {}
+        for filepath in batch:
+            try:
+                os.unlink(filepath)
+            except OSError as e:
+                failed[filepath] = e
+        return len(batch) - len(failed), failed
+
+    def collect(futures):
+        nonlocal n_removed, last_print
+        for future in futures:
+            removed, failed = future.result()
+            n_removed += removed
+            errors.update(failed)
+        if verbose and time.monotonic() - last_print > 1:
+            print(f'{n_removed} files removed')
+            last_print = time.monotonic()
+
+    directories = []
+    stack = [dirpath]
+    pending = set()
+    batch_size = 1000
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while stack:
+            folder = stack.pop()
+            directories.append(folder)
+            batch = []
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            batch.append(entry.path)
+            except OSError as e:
+                if folder == dirpath:
+                    raise
+                errors[folder] = e
+
+            for i in range(0, len(batch), batch_size):
+                pending.add(executor.submit(unlink, batch[i:i+batch_size]))
+                # bounded number of queued batches
+                if len(pending) > 2*max_workers:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+        collect(concurrent.futures.as_completed(pending))
+
+    # subfolders are found after their parents, so reversed order is safe
+    for folder in reversed(directories):
+        try:
+            os.rmdir(folder)
+        except OSError as e:
+            errors[folder] = e
+
+    if verbose:
+        print(f'{n_removed} files and {len(directories) - len([f for f in directories if f in errors])} folders removed. {len(errors)} errors.')
+    if errors:
+        path = next(iter(errors))
+        warnings.warn(f'{len(errors)} paths in {dirpath} could not be removed, e.g., {path} ({type(errors[path]).__name__}: {errors[path]}).')
+    return errors
 
 
 def rm(filepath):
@@ -118,7 +396,86 @@ def rm(filepath):
     filepath = Path(filepath).unlink()
 
 
-def filelist(dirpath='.', string='*'):
+_dir_indexes = {}
+"""Cached directory indexes (see :py:func:`dir_index`)."""
+
+_filename_number_pattern = re.compile(r'[\d]+[.,\d]+|[\d]*[.][\d]+|[\d]+')
+
+
+def dir_index(dirpath='.', refresh=False):
+    """Return a cached index of the files in a directory.
+
+    The directory is scanned with ``os.scandir`` and the index is kept in
+    memory. Next calls only scan the directory again if its modification time
+    changed (a file was created, deleted, or renamed). Entries of files that
+    were already indexed are kept, so their cached stat and parsed filename
+    numbers are reused.
+
+    Warning:
+        Stat results are cached the first time they are requested and are not
+        updated if a file is modified in place. Use ``refresh=True`` to
+        start a new index.
+
+    Args:
+        dirpath (str or pathlib.Path, optional): directory path.
+        refresh (bool, optional): if True, directory is scanned again from
+            scratch.
+
+    Returns:
+        dictionary with keys ``'entries'`` (dict ``{name: os.DirEntry}``, use
+        ``entry.stat()`` for cached stat results), ``'names'`` (sorted list of
+        names), and ``'numbers'`` (dict ``{name: numbers}`` with numbers
+        parsed from filenames, filled when needed, see :py:func:`parsed_filelist`),
+        ``'queries'`` (results of :py:func:`filelist` for this index), and
+        ``'tables'`` (see :py:func:`number_table`).
+
+    See Also:
+        :py:func:`filelist`, :py:func:`parsed_filelist`
+    """
+    key = os.path.abspath(dirpath)
+    mtime = os.stat(key).st_mtime_ns
+    index = _dir_indexes.get(key)
+
+    if index is None or refresh:
+        index = {'mtime': None, 'recent': True, 'entries': {}, 'names': [], 'numbers': {}, 'queries': {}, 'tables': {}}
+        _dir_indexes[key] = index
+
+    # a directory modified in the last seconds may change again without
+    # changing its mtime (coarse mtime resolution), so it is always rescanned
+    if index['mtime'] != mtime or index['recent']:
+        old = index['entries']
+        with os.scandir(key) as it:
+            entries = {entry.name: old.get(entry.name, entry) for entry in it}
+        index['entries'] = entries
+        index['names'] = sorted(entries)
+        index['numbers'] = {name: n for name, n in index['numbers'].items() if name in entries}
+        index['queries'] = {}
+        index['tables'] = {}
+        index['mtime'] = mtime
+        index['recent'] = time.time_ns() - mtime < 2e9
+    return index
+
+
+def _filename_numbers(name, index=None):
+    """Return list with numbers (as strings) within a filename (without suffix).
+
+    Returns None if there is no number in the name (including suffix). If
+    index is given (see :py:func:`dir_index`), results are cached.
+    """
+    if index is not None and name in index['numbers']:
+        return index['numbers'][name]
+
+    if _filename_number_pattern.search(name) is None:
+        n = None
+    else:
+        n = _filename_number_pattern.findall(PurePath(name).with_suffix('').name)
+
+    if index is not None:
+        index['numbers'][name] = n
+    return n
+
+
+def filelist(dirpath='.', string='*', use_index=True):
     """Returns a list with all the files containg `string` in its name.
 
     Note:
@@ -128,6 +485,9 @@ def filelist(dirpath='.', string='*'):
         dirpath (str or pathlib.Path, optional): list with full file directory
         paths.
         string (str, optional): string to look for in file names.
+        use_index (bool, optional): if True, the cached directory index is used
+            (see :py:func:`dir_index`), which is much faster for repeated calls
+            on large directories. Patterns with subfolders are always globbed.
 
     Return:
         list
@@ -140,6 +500,13 @@ def filelist(dirpath='.', string='*'):
     if '*' not in string:
         string = '*' + string + '*'
 
+    if use_index and '/' not in string and os.sep not in string:
+        index = dir_index(dirpath)
+        key = (str(dirpath), string)
+        if key not in index['queries']:
+            index['queries'][key] = [dirpath/name for name in fnmatch.filter(index['names'], string)]
+        return list(index['queries'][key])
+
     temp = list(dirpath.glob(string))
 
     temp2 = [filepath.name for filepath in temp]
@@ -147,7 +514,7 @@ def filelist(dirpath='.', string='*'):
     return [x for _,x in sorted(zip(temp2,temp))]
 
 
-def parsed_filelist(dirpath='.', string='*', ref=0, type='int'):
+def parsed_filelist(dirpath='.', string='*', ref=0, type='int', use_index=True):
     """Returns a filelist organized in a dictionary.
 
     I searches for numbers (float and int) within the filenames (or foldernames)
@@ -159,6 +526,8 @@ def parsed_filelist(dirpath='.', string='*', ref=0, type='int'):
         ref (int, optional): index of the reference number to be used as key.
         type (string, optional): if 'int', dict keys are transormed in integers.
             If 'float', dict keys are transformed into float.
+        use_index (bool, optional): if True, the cached directory index is used
+            and numbers parsed from filenames are cached (see :py:func:`dir_index`).
 
     Returns:
         Dictionary. Dict keys are some number found in filename.
@@ -168,23 +537,19 @@ def parsed_filelist(dirpath='.', string='*', ref=0, type='int'):
     """
     dirpath = Path(dirpath)
 
-    file_list = filelist(dirpath=dirpath, string=string)
+    file_list = filelist(dirpath=dirpath, string=string, use_index=use_index)
+    index = dir_index(dirpath) if use_index else None
 
     temp = dict()
 
-    p = '[\d]+[.,\d]+|[\d]*[.][\d]+|[\d]+'
-
     for filepath in file_list:
-        if re.search(p, filepath.name) is not None:
-            n = []
-            for catch in re.finditer(p, filepath.with_suffix('').name):
-                n.append(catch[0])
+        n = _filename_numbers(filepath.name, index)
+        if n is not None:
             if type=='int':
                 temp[int(float((n[ref])))] = filepath
             else:
                 temp[float(n[ref])] = filepath
 
-
     # ordering
     a = list(temp.keys())
     a.sort()
@@ -196,15 +561,247 @@ def parsed_filelist(dirpath='.', string='*', ref=0, type='int'):
     return parsed_folder
 
 
-def save_text(string, filepath='./Untitled.txt', check_overwrite=False):
+def number_table(dirpath='.', string='*'):
+    """Return a table with all numbers within the filenames of a directory.
+
+    The table is cached in the directory index (see :py:func:`dir_index`), so
+    the directory is not scanned and filenames are not parsed again unless
+    the directory changes.
+
+    Args:
+        dirpath (str or pathlib.Path, optional): directory path.
+        string (str, optional): string to filter filenames (see :py:func:`filelist`).
+
+    Returns:
+        dictionary with keys ``'names'`` (list of sorted filenames),
+        ``'numbers'`` (2D array, files x number positions, where position 0 is
+        the first number in the filename, 1 is the second, and so on. nan if
+        a file has less numbers), and ``'sorted'`` (list with
+        ``(sorted values, indexes)`` for each number position, used for
+        binary search).
+
+    See Also:
+        :py:func:`query_filelist`
+    """
+    if '*' not in string:
+        string = '*' + string + '*'
+    index = dir_index(dirpath)
+    if string in index['tables']:
+        return index['tables'][string]
+
+    names = fnmatch.filter(index['names'], string)
+    rows = [_filename_numbers(name, index) or [] for name in names]
+    n_positions = max([len(row) for row in rows], default=0)
+
+    numbers = np.full((len(names), n_positions), np.nan)
+    for i, row in enumerate(rows):
+        for j, n in enumerate(row):
+            try:
+                numbers[i, j] = float(n)
+            except ValueError:  # e.g., 1,5
+                pass
+
+    sorted_columns = []
+    for j in range(n_positions):
+        order = np.argsort(numbers[:, j], kind='stable')  # nan goes to the end
+        sorted_columns.append((numbers[order, j], order))
+
+    table = {'names': names, 'numbers': numbers, 'sorted': sorted_columns}
+    index['tables'][string] = table
+    return table
+
+
+def query_filelist(dirpath='.', string='*', conditions=None, sort_by=None):
+    """Returns a list of files selected by the numbers within the filenames.
+
+    Example:
+        Files like ``'sample_T20K_H2T_005.dat'`` with temperature (first
+        number) between 10 and 50 and field (second number) equal to 2:
+
+        >>> fm.query_filelist('.', '*.dat', conditions={0: (10, 50), 1: 2})
+
+    Args:
+        dirpath (str or pathlib.Path, optional): directory path.
+        string (str, optional): string to filter filenames.
+        conditions (dict, optional): ``{position: value}`` or
+            ``{position: (min, max)}``, where position is the index of the
+            number within the filename (0 for the first number). A range
+            includes min and max. Use None for min or max for open ranges.
+            All conditions must be satisfied.
+        sort_by (int, optional): list is sorted by the number at this
+            position. If None, list is sorted by filename.
+
+    Returns:
+        list
+
+    See Also:
+        :py:func:`number_table`, :py:func:`parsed_filelist`
+    """
+    dirpath = Path(dirpath)
+    table = number_table(dirpath, string)
+    n_files, n_positions = table['numbers'].shape
+
+    mask = np.ones(n_files, dtype=bool)
+    if conditions is not None:
+        for position in conditions:
+            if position >= n_positions:
+                return []
+            try:
+                start, stop = conditions[position]
+            except TypeError:
+                start, stop = conditions[position], conditions[position]
+            values, order = table['sorted'][position]
+            first = 0 if start is None else np.searchsorted(values, start, side='left')
+            last = np.searchsorted(values, np.inf, side='right') if stop is None else np.searchsorted(values, stop, side='right')
+            selected = np.zeros(n_files, dtype=bool)
+            selected[order[first:last]] = True
+            mask &= selected
+
+    if sort_by is None:
+        rows = np.flatnonzero(mask)
+    else:
+        order = table['sorted'][sort_by][1]
+        rows = order[mask[order]]
+
+    names = table['names']
+    return [dirpath/names[i] for i in rows]
+
+
+def watch_dir(dirpath='.', string='*', existing=False, timeout=None, interval=1, settle=2, use_inotify=True, load=False, **kwargs):
+    """Yield new files in a directory as soon as they are completely written.
+
+    On Linux, if the package ``inotify_simple`` is installed
+    (``pip install inotify_simple``), the directory is watched by the kernel
+    and files are yielded when they are closed after writing (or moved into
+    the directory). Otherwise, the directory is polled: it is only scanned
+    again when its modification time changes (see :py:func:`dir_index`) and a
+    new file is yielded once its size and modification time stop changing
+    for ``settle`` seconds.
+
+    Example:
+        Online analysis during acquisition:
+
+        >>> for filepath, data in fm.watch_dir('.', '*.dat', load=True, timeout=600):
+        ...     process(data)
+
+    Args:
+        dirpath (str or pathlib.Path, optional): directory path.
+        string (str, optional): string to filter filenames (see :py:func:`filelist`).
+        existing (bool, optional): if True, files that already exist are
+            yielded first.
+        timeout (number, optional): stop watching if no new file appears
+            within timeout seconds. If None, it watches forever.
+        interval (number, optional): time in seconds between directory polls.
+        settle (number, optional): time in seconds that size and modification
+            time of a file must remain the same for it to be considered
+            completely written (only for polling).
+        use_inotify (bool, optional): if False, polling is always used.
+        load (bool, optional): if True, files are loaded with
+            :py:func:`load_data` and ``(filepath, data)`` is yielded.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Note:
+        Hidden files (starting with ``.``), e.g., temporary files of
+        atomic writes (see :py:func:`save_data`), are ignored.
+
+    Yields:
+        filepath (pathlib.Path), or (filepath, data) if ``load=True``.
+
+    See Also:
+        :py:func:`filelist`
+    """
+    dirpath = Path(dirpath)
+    if '*' not in string:
+        string = '*' + string + '*'
+
+    def match(names):
+        return [name for name in fnmatch.filter(names, string) if not name.startswith('.')]
+
+    def output(filepath):
+        if load:
+            return filepath, load_data(filepath, **kwargs)
+        return filepath
+
+    if use_inotify and is_linux and INotify is not None:
+        with INotify() as inotify:
+            # watch starts before listing existing files, so no file is lost
+            inotify.add_watch(str(dirpath), inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+            known = set(match(os.listdir(dirpath)))
+            if existing:
+                for name in sorted(known):
+                    if (dirpath/name).is_file():
+                        yield output(dirpath/name)
+            while True:
+                events = inotify.read(timeout=None if timeout is None else int(timeout*1000))
+                if not events:
+                    return
+                for event in events:
+                    if event.name not in known and match([event.name]):
+                        known.add(event.name)
+                        yield output(dirpath/event.name)
+
+    # polling
+    known = set()
+    pending = {}
+    if not existing:
+        known.update(match(dir_index(dirpath)['names']))
+    last_new = time.monotonic()
+    while True:
+        for name in match(dir_index(dirpath)['names']):
+            if name not in known and name not in pending:
+                pending[name] = None
+
+        # only new files are checked, so a poll does not depend on directory size
+        completed = []
+        for name in sorted(pending):
+            try:
+                file_stat = os.stat(dirpath/name)
+            except FileNotFoundError:
+                del pending[name]
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                known.add(name)
+                del pending[name]
+                continue
+            signature = (file_stat.st_size, file_stat.st_mtime_ns)
+            if pending[name] == signature and time.time_ns() - file_stat.st_mtime_ns >= settle*1e9:
+                completed.append(name)
+            else:
+                pending[name] = signature
+
+        for name in completed:
+            known.add(name)
+            del pending[name]
+            last_new = time.monotonic()
+            yield output(dirpath/name)
+
+        if timeout is not None and not pending and time.monotonic() - last_new > timeout:
+            return
+        time.sleep(interval)
+
+
+def save_text(string, filepath='./Untitled.txt', check_overwrite=False, compresslevel=None, skip_unchanged=False):
     """Save text to txt file.
 
+    If filepath ends with ``.gz``, ``.bz2``, ``.xz``, or ``.zst``, the file is
+    compressed (see ``compression_extensions``).
+
     Args:
         string (str): string to be saved.
         filepath (str or pathlib.Path, optional): path to save file. If no path
             is given, current working directory is used.
         check_overwrite (bool, optional): if True, it will check if file exists
             and ask if user want to overwrite file.
+        compresslevel (int, optional): compression level of compressed files.
+            If None, the default level of the compression format is used.
+        skip_unchanged (bool, optional): if True, the file is only written if
+            its content changed, which avoids rewriting identical files (and
+            changing their modification time) when a pipeline runs again.
+            Content is compared by a hash of the (uncompressed) file content.
+            Hashes of files written in this session are kept in memory, so
+            unchanged files are not read again. Files are written
+            atomically, i.e., to a temporary file which then replaces the
+            file, so a file is never left half-written.
 
     See Also:
         :py:func:`load_text`
@@ -223,42 +820,553 @@ def save_text(string, filepath='./Untitled.txt', check_overwrite=False):
                 warnings.warn('filepath is pointing to a folder. Saving file as Untitled.txt')
                 filepath = filepath/'Untitled.txt'
 
-    f = open(str(filepath), 'w')
-    f.write(string)
-    f.close()
+    _write_file(filepath, lambda file: file.write(string), skip_unchanged=skip_unchanged, compresslevel=compresslevel)
 
 
-def load_text(filepath):
+_file_digests = {}
+"""Digests of files written with ``skip_unchanged=True``, {path: (size, mtime, digest)}."""
+
+
+def _file_digest(filepath):
+    """Return hash of the (uncompressed) content of a file."""
+    stat_result = os.stat(filepath)
+    key = os.path.abspath(filepath)
+    if key in _file_digests and _file_digests[key][:2] == (stat_result.st_size, stat_result.st_mtime_ns):
+        return _file_digests[key][2]
+
+    h = hashlib.blake2b(digest_size=16)
+    with _open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            h.update(block)
+    _file_digests[key] = (stat_result.st_size, stat_result.st_mtime_ns, h.digest())
+    return h.digest()
+
+
+def _temp_path(filepath):
+    """Return path of a hidden temporary file next to filepath (it does not match patterns like ``*.dat``)."""
+    return filepath.with_name(f'.{filepath.name}.{os.urandom(4).hex()}.tmp')
+
+
+def _write_file(filepath, write, binary=False, skip_unchanged=False, **kwargs):
+    """Write a file (compressed on the fly if needed, see :py:func:`_open`).
+
+    Args:
+        filepath (pathlib.Path): path to file.
+        write (function): function that writes the content to a file object,
+            i.e., ``write(file)``.
+        binary (bool, optional): if True, file object is in binary mode.
+        skip_unchanged (bool, optional): if True, content is written to
+            memory first and the file is only written (atomically) if the
+            content changed.
+        **kwargs: arguments passed to :py:func:`_open`.
+
+    Returns:
+        True if file was written, False if it did not change.
+    """
+    if not skip_unchanged:
+        with _open(filepath, 'wb' if binary else 'w', **kwargs) as file:
+            write(file)
+        return True
+
+    buffer = io.BytesIO()
+    if binary:
+        write(buffer)
+    else:
+        # same encoding and newline translation of files opened by open()
+        wrapper = io.TextIOWrapper(buffer)
+        write(wrapper)
+        wrapper.flush()
+        wrapper.detach()
+    data = buffer.getbuffer()
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+
+    # size of uncompressed files is checked first (no reading)
+    if filepath.is_file():
+        if _compression(filepath, 'w') is not None or filepath.stat().st_size == len(data):
+            if _file_digest(filepath) == digest:
+                return False
+
+    temp = _temp_path(filepath)
+    kwargs.pop('buffering', None)
+    try:
+        with _open(temp, 'wb', compression=_compression(filepath, 'w'), **kwargs) as file:
+            file.write(data)
+        if filepath.is_file():
+            os.chmod(temp, stat.S_IMODE(filepath.stat().st_mode))
+        os.replace(temp, filepath)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+    stat_result = filepath.stat()
+    _file_digests[os.path.abspath(filepath)] = (stat_result.st_size, stat_result.st_mtime_ns, digest)
+    return True
+
+
+def load_text(filepath, lines=None):
     """Load text from txt file.
 
+    Compressed files (gzip, bz2, xz, zstd) are decompressed on the fly.
+
     Args:
         filepath (str or pathlib.Path): filepath to load.
+        lines (int or slice, optional): if given, only this line (or range of
+            lines, e.g., ``slice(1000, 2000)``) is read, without reading the
+            rest of the file (see :py:func:`load_lines`).
 
     Returns:
         string.
 
     See Also:
-        :py:func:`save_text`
+        :py:func:`save_text`, :py:func:`load_lines`, :py:func:`iter_lines`
     """
-    f = Path(filepath).open()
+    if lines is not None:
+        if isinstance(lines, slice):
+            if lines.step not in (None, 1):
+                raise ValueError('lines slice cannot have a step.')
+            return ''.join(load_lines(filepath, lines.start, lines.stop))
+        return ''.join(load_lines(filepath, lines, lines + 1 if lines != -1 else None))
+
+    f = _open(str(filepath))
     text = f.read()
     f.close()
     return text
 
 
-def save_obj(obj, filepath='./Untitled.txt', check_overwrite=False, pretty_print=True):
+line_index_step = 100
+"""Number of lines between offsets saved in the line index (see :py:func:`line_index`)."""
+
+_line_indexes = {}
+
+
+def line_index(filepath, persist=False):
+    """Return the line index of a text file.
+
+    The index has the byte offset of every ``line_index_step`` lines, so
+    any line can be found by searching at most ``line_index_step`` lines
+    of the memory mapped file. The index is built in blocks with numpy the
+    first time it is needed, and kept in memory while the file size and
+    modification time do not change.
+
+    Args:
+        filepath (str or pathlib.Path): path to file (not compressed).
+        persist (bool, optional): if True, the index is also saved next to
+            the file (``.<filename>.lines.npy``) and loaded from there
+            next time (e.g., by other processes).
+
+    Returns:
+        dictionary with offsets (array), step, and n_lines (number of lines).
+
+    See Also:
+        :py:func:`load_lines`, :py:func:`iter_lines`
+    """
+    filepath = Path(filepath)
+    if _compression(filepath) is not None:
+        raise ValueError('Line index is not available for compressed files.')
+    stat_result = filepath.stat()
+    key = (stat_result.st_size, stat_result.st_mtime_ns, line_index_step)
+    path = str(filepath.resolve())
+
+    # saved index: size, mtime, step, n_lines, offsets...
+    index_path = filepath.parent/('.' + filepath.name + '.lines.npy')
+    saved = False
+    if path in _line_indexes and _line_indexes[path][0] == key:
+        index = _line_indexes[path][1]
+        saved = not persist or _saved_line_index(index_path, key) is not None
+    else:
+        index = None
+        if persist:
+            index = _saved_line_index(index_path, key)
+            saved = index is not None
+        if index is None:
+            index = _build_line_index(filepath, line_index_step)
+        _line_indexes[path] = (key, index)
+
+    if persist and not saved:
+        np.save(index_path, np.concatenate([np.array(key + (index['n_lines'], ), dtype=np.int64), index['offsets']]))
+    return index
+
+
+def _saved_line_index(index_path, key):
+    """Return line index saved by :py:func:`line_index` (None if it does not exist or is outdated)."""
+    try:
+        array = np.load(index_path, mmap_mode='r')
+        if tuple(array[:3]) == key:
+            return {'offsets': array[4:], 'step': line_index_step, 'n_lines': int(array[3])}
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _build_line_index(filepath, step, blocksize=2**26):
+    """Return line index of a file (see :py:func:`line_index`) by searching newlines in blocks of blocksize bytes."""
+    offsets = [np.zeros(1, dtype=np.int64)]
+    n_lines = 0  # number of newlines before current block
+    with open(filepath, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return {'offsets': np.zeros(0, dtype=np.int64), 'step': step, 'n_lines': 0}
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, size, blocksize):
+                block = np.frombuffer(mm, dtype=np.uint8, count=min(blocksize, size - start), offset=start)
+                newlines = np.flatnonzero(block == 10)
+                # line number n starts after newline n - 1
+                first = (-n_lines - 1) % step
+                offsets.append(newlines[first::step] + (start + 1))
+                n_lines += len(newlines)
+                del block
+            last_complete = mm[size - 1] == 10
+    offsets = np.concatenate(offsets)
+    if last_complete and offsets[-1] == size:
+        offsets = offsets[:-1]
+    return {'offsets': offsets, 'step': step, 'n_lines': n_lines + (0 if last_complete else 1)}
+
+
+def _line_offset(mm, index, n):
+    """Return byte offset of line n of a memory mapped file."""
+    if n >= index['n_lines']:
+        return len(mm)
+    position = int(index['offsets'][n//index['step']])
+    for _ in range(n % index['step']):
+        position = mm.find(b'\n', position) + 1
+    return position
+
+
+def load_lines(filepath, start=0, stop=None, persist=False):
+    """Return a range of lines of a text file.
+
+    Only the requested lines are read from the memory mapped file, using the
+    line index (see :py:func:`line_index`), so access time and memory do not
+    depend on the file size. Compressed files are read until ``stop``.
+
+    Example:
+        >>> fm.load_lines('huge.log', 1000000, 1000010)  # lines 1000000 to 1000009
+        >>> fm.load_lines('huge.log', -5)  # last 5 lines
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        start (int, optional): first line (starts at 0). Negative values
+            count from the end of the file.
+        stop (int, optional): line after the last line. If None, lines are
+            read until the end of the file.
+        persist (bool, optional): see :py:func:`line_index`.
+
+    Returns:
+        list with lines (including newline characters).
+
+    See Also:
+        :py:func:`iter_lines`, :py:func:`load_text`
+    """
+    if _compression(filepath) is not None:
+        if (start is not None and start < 0) or (stop is not None and stop < 0):
+            return _open(filepath).readlines()[start:stop]
+        with _open(filepath) as file:
+            return list(itertools.islice(file, start, stop))
+
+    index = line_index(filepath, persist=persist)
+    start, stop, _ = slice(start, stop).indices(index['n_lines'])
+    if stop <= start:
+        return []
+    with open(filepath, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            begin = _line_offset(mm, index, start)
+            end = _line_offset(mm, index, stop)
+            text = mm[begin:end].decode(locale.getpreferredencoding(False))
+    return text.replace('\r\n', '\n').splitlines(True)
+
+
+def iter_lines(filepath, start=0, stop=None, persist=False):
+    """Iterate over lines of a text file.
+
+    Lines are read as they are needed, so memory usage does not depend on the
+    file size. The first line is found with the line index (see
+    :py:func:`line_index`), so iteration can start anywhere in the file
+    without reading the lines before it.
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        start (int, optional): first line (starts at 0).
+        stop (int, optional): line after the last line. If None, lines are
+            read until the end of the file.
+        persist (bool, optional): see :py:func:`line_index`.
+
+    Yields:
+        line (including newline character).
+
+    See Also:
+        :py:func:`load_lines`
+    """
+    if start < 0 or (stop is not None and stop < 0):
+        raise ValueError('start and stop must be positive for iter_lines. Use load_lines for negative values.')
+    if _compression(filepath) is not None or start == 0:
+        with _open(filepath) as file:
+            yield from itertools.islice(file, start, stop)
+        return
+
+    index = line_index(filepath, persist=persist)
+    if start >= index['n_lines']:
+        return
+    with open(filepath, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = _line_offset(mm, index, start)
+    with open(filepath) as file:
+        file.seek(position)
+        yield from itertools.islice(file, None if stop is None else stop - start)
+
+
+_scan_indexes = {}
+
+
+def scan_index(filepath, scan_flag='#S', persist=True):
+    """Return the index of scans in a file with many scans (e.g., spec files).
+
+    Each scan starts with a line beginning with ``scan_flag`` followed by
+    the scan number (e.g., ``#S 12  ascan th 0 1 10 1``), then comment
+    lines (the last one with ``#L`` has the column labels), then data. The
+    index has the byte offsets of each scan, so any scan can be loaded
+    without parsing the rest of the file (see :py:func:`load_scan`).
+
+    The index is kept in memory while the file does not change. If the file
+    grows (e.g., new scans are appended while measuring), only the new part
+    of the file is indexed.
+
+    Args:
+        filepath (str or pathlib.Path): path to file (not compressed).
+        scan_flag (str, optional): string that indicates the first line of
+            a scan.
+        persist (bool, optional): if True, the index is also saved next to
+            the file (``.<filename>.scans.json``) and loaded from there
+            next time (e.g., by other processes). If it cannot be saved
+            (e.g., read-only folder), the index is only kept in memory.
+
+    Returns:
+        list with one dictionary for each scan, with keys number, command
+        (rest of the first line), start (offset of the first line), data
+        (offset of the first data line), and stop (offset after the scan).
+
+    See Also:
+        :py:func:`load_scan`, :py:func:`load_scan_header`
+    """
+    filepath = Path(filepath)
+    if _compression(filepath) is not None:
+        raise ValueError('Scan index is not available for compressed files.')
+    stat_result = filepath.stat()
+    key = [stat_result.st_size, stat_result.st_mtime_ns, scan_flag]
+    path = str(filepath.resolve())
+    if path in _scan_indexes and _scan_indexes[path]['key'] == key:
+        return _scan_indexes[path]['scans']
+
+    saved = _scan_indexes.get(path)
+    index_path = filepath.parent/('.' + filepath.name + '.scans.json')
+    if saved is None and persist and index_path.exists():
+        try:
+            with open(index_path) as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            saved = None
+    if saved is not None and saved['key'] == key:
+        _scan_indexes[path] = saved
+        return saved['scans']
+
+    with open(filepath, 'rb') as file:
+        if stat_result.st_size == 0:
+            scans = []
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # file grew: last indexed scan (maybe incomplete) is indexed again
+                scans = []
+                if saved is not None and saved['key'][2] == scan_flag and saved['key'][0] <= len(mm) and saved['scans'] and _scan_check(mm, saved['key'][0]) == saved['check']:
+                    scans = saved['scans'][:-1]
+                begin = scans[-1]['stop'] if scans else 0
+                scans = scans + _build_scan_index(mm, begin, scan_flag)
+                check = _scan_check(mm, len(mm))
+
+    _scan_indexes[path] = {'key': key, 'check': check if scans else '', 'scans': scans}
+    if persist:
+        try:
+            with open(index_path, 'w') as file:
+                json.dump(_scan_indexes[path], file)
+        except OSError:  # e.g., read-only folder (index is kept in memory)
+            pass
+    return scans
+
+
+def _scan_check(mm, size, n=2**16):
+    """Return hash of the first and last n bytes of the first size bytes of a memory mapped file."""
+    return hashlib.blake2b(mm[:min(n, size)] + mm[max(0, size - n):size], digest_size=16).hexdigest()
+
+
+def _build_scan_index(mm, begin, scan_flag):
+    """Return index of scans (see :py:func:`scan_index`) starting from byte offset begin of a memory mapped file."""
+    flag = scan_flag.encode() + b' '
+    starts = []
+    if mm[begin:begin + len(flag)] == flag:
+        starts.append(begin)
+    position = mm.find(b'\n' + flag, begin)
+    while position != -1:
+        starts.append(position + 1)
+        position = mm.find(b'\n' + flag, position + 1)
+
+    scans = []
+    for start, stop in zip(starts, starts[1:] + [len(mm)]):
+        end = mm.find(b'\n', start, stop)
+        end = stop if end == -1 else end
+        words = mm[start + len(flag):end].decode(errors='replace').split(None, 1)
+        try:
+            number = int(words[0])
+        except (IndexError, ValueError):
+            warnings.warn(f'Cannot read scan number: {mm[start:end].decode(errors="replace")}')
+            continue
+
+        # first data line: first line that is not empty or a comment
+        data = end + 1
+        while data < stop:
+            end = mm.find(b'\n', data, stop)
+            end = stop if end == -1 else end
+            line = mm[data:end].strip()
+            if line and not line.startswith(b'#'):
+                break
+            data = end + 1
+        scans.append({'number': number,
+                      'command': words[1].strip() if len(words) > 1 else '',
+                      'start': start,
+                      'data': min(data, stop),
+                      'stop': stop})
+    return scans
+
+
+def _find_scan(scans, number):
+    """Return index entry of a scan number. If number is repeated, the last scan is returned."""
+    found = [scan for scan in scans if scan['number'] == number]
+    if not found:
+        raise KeyError(f'Scan {number} not found.')
+    if len(found) > 1:
+        warnings.warn(f'There are {len(found)} scans with number {number}. Loading the last one.')
+    return found[-1]
+
+
+def load_scan_header(filepath, number, scan_flag='#S', persist=True):
+    """Return the comment lines of a scan in a file with many scans.
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        number (int): scan number.
+        scan_flag (str, optional): see :py:func:`scan_index`.
+        persist (bool, optional): see :py:func:`scan_index`.
+
+    Returns:
+        list with comment lines (including the first line of the scan).
+
+    See Also:
+        :py:func:`load_scan`
+    """
+    scan = _find_scan(scan_index(filepath, scan_flag=scan_flag, persist=persist), number)
+    with open(filepath, 'rb') as file:
+        file.seek(scan['start'])
+        text = file.read(scan['data'] - scan['start']).decode()
+    return [line for line in text.splitlines(keepends=True) if line.strip()]
+
+
+def load_scan(filepath, numbers, labels=None, force_array=False, dataset=False, scan_flag='#S', persist=True):
+    """Load scans from a file with many scans (e.g., spec files).
+
+    Only the selected scans are read (see :py:func:`scan_index`).
+
+    Example:
+        >>> data = fm.load_scan('experiment.spec', 12)
+        >>> data['Epoch']
+        >>> scans = fm.load_scan('experiment.spec', range(10, 20))
+        >>> scans[15]
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        numbers (int or list): scan number or list of scan numbers.
+        labels (list, optional): column labels. If None, labels are read
+            from the ``#L`` line of the scan, where labels are separated by
+            two spaces (or by delimiter of the data).
+        force_array (bool, optional): if True, data is returned as an array.
+        dataset (bool, optional): if True, data is returned as a
+            :py:class:`Dataset` instead of a dictionary.
+        scan_flag (str, optional): see :py:func:`scan_index`.
+        persist (bool, optional): see :py:func:`scan_index`.
+
+    Returns:
+        Data of a scan (dictionary or array, see :py:func:`load_data`), or,
+        if numbers is a list, a dictionary ``{number: data}``.
+
+    See Also:
+        :py:func:`scan_index`, :py:func:`load_scan_header`
+    """
+    scans = scan_index(filepath, scan_flag=scan_flag, persist=persist)
+    if isinstance(numbers, (int, np.integer)):
+        selected = [_find_scan(scans, numbers)]
+    else:
+        selected = [_find_scan(scans, number) for number in numbers]
+
+    output = {}
+    with open(filepath, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for scan in selected:
+                header = mm[scan['start']:scan['data']].decode()
+                if scan['data'] < scan['stop']:
+                    data = _parse_data(io.StringIO(mm[scan['data']:scan['stop']].decode()), 0, ndmin=2)
+                else:  # scan without data (e.g., aborted)
+                    data = None
+
+                scan_labels = labels
+                if scan_labels is None and not force_array:
+                    for line in header.splitlines()[::-1]:
+                        if line.startswith('#L'):
+                            scan_labels = re.split(r'\s{2,}|\t', line[2:].strip())
+                            if data is not None and len(scan_labels) != data.shape[1]:
+                                scan_labels = line[2:].split()
+                            break
+                if data is None:
+                    data = np.empty((0, 0 if scan_labels is None else len(scan_labels)))
+                    if scan_labels is None or len(scan_labels) != data.shape[1]:
+                        warnings.warn(f'Cannot find column labels of scan {scan["number"]}. Importing data as an array.')
+                        scan_labels = None
+
+                if scan_labels is None or force_array:
+                    output[scan['number']] = np.squeeze(data)
+                else:
+                    ds = Dataset(data, scan_labels)
+                    output[scan['number']] = ds if dataset else dict(ds)
+
+    if isinstance(numbers, (int, np.integer)):
+        return output[numbers]
+    return output
+
+
+def save_obj(obj, filepath='./Untitled.txt', check_overwrite=False, pretty_print=True, arrays='npz', compress=False, skip_unchanged=False):
     """Save object (array, dictionary, list, etc...) to a txt file.
 
+    Object is saved in json format. Numpy arrays within the object are saved
+    in binary format in a sidecar file (``<filepath>.npz``) and a reference
+    to the array is written in the json file. If there are no arrays, only
+    the json file is saved.
+
     Args:
         obj (object): object to be saved.
         filepath (str or pathlib.Path, optional): path to save file.
         check_overwrite (bool, optional): if True, it will check if file exists
             and ask if user want to overwrite file.
+        pretty_print (bool, optional): if True, json file is indented.
+        arrays (str, optional): if 'npz', arrays are saved to the sidecar
+            binary file. If 'list', arrays are converted to lists and saved in
+            the json file (plain json, but large and slow for big arrays).
+        compress (bool, optional): if True, sidecar file is compressed. Note
+            that compressed arrays cannot be memory mapped by :py:func:`load_obj`.
+        skip_unchanged (bool, optional): if True, json and sidecar files are
+            only written if their content changed (see :py:func:`save_text`).
+            Files are written atomically (temporary file and rename).
 
     See Also:
         :py:func:`load_obj`
     """
     filepath = Path(filepath)
+    if arrays not in ('npz', 'list'):
+        raise ValueError(f"arrays must be 'npz' or 'list', not '{arrays}'.")
 
     if check_overwrite:
         if filepath.exists() == True:
@@ -272,35 +1380,139 @@ def save_obj(obj, filepath='./Untitled.txt', check_overwrite=False, pretty_print
                 warnings.warn('filepath is pointing to a folder. Saving file as Untitled.txt')
                 filepath = filepath/'Untitled.txt'
 
-    with open(str(filepath), 'w') as file:
-        if pretty_print:
-            file.write(json.dumps(obj, indent=4, sort_keys=False))
+    # arrays are replaced by a reference and collected
+    collected = {}
+    def default(x):
+        if isinstance(x, np.ndarray):
+            if arrays == 'list' or x.dtype.hasobject:
+                return x.tolist()
+            name = f'arr_{len(collected)}'
+            collected[name] = x
+            return {'__ndarray__': name}
+        elif isinstance(x, np.generic):
+            return x.item()
+        raise TypeError(f'Object of type {type(x).__name__} is not JSON serializable')
+
+    if pretty_print:
+        text = json.dumps(obj, indent=4, sort_keys=False, default=default)
+    else:
+        text = json.dumps(obj, default=default)
+
+    _write_file(filepath, lambda file: file.write(text), skip_unchanged=skip_unchanged)
+
+    sidecar = _obj_sidecar(filepath)
+    if collected:
+        savez = np.savez_compressed if compress else np.savez
+        _write_file(sidecar, lambda file: savez(file, **collected), binary=True, skip_unchanged=skip_unchanged)
+    elif sidecar.exists():
+        sidecar.unlink()
+
+
+def _obj_sidecar(filepath):
+    """Return path of the file where arrays from :py:func:`save_obj` are saved."""
+    return filepath.with_name(filepath.name + '.npz')
+
+
+def _npz_memmap(zfile, name):
+    """Memory map an array saved in an uncompressed npz file.
+
+    Args:
+        zfile (zipfile.ZipFile): npz file opened for reading.
+        name (str): array name.
+
+    Returns:
+        read-only np.memmap, or None if array cannot be memory mapped
+        (compressed or object arrays).
+    """
+    info = zfile.getinfo(name + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(zfile.filename, 'rb') as file:
+        # zip local file header: 30 bytes + filename + extra field
+        file.seek(info.header_offset + 26)
+        n, m = np.frombuffer(file.read(4), dtype='<u2')
+        file.seek(info.header_offset + 30 + int(n) + int(m))
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
         else:
-            file.write(json.dumps(obj))
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    if dtype.hasobject:
+        return None
+    if 0 in shape:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(zfile.filename, dtype=dtype, mode='r', shape=shape, offset=offset, order='F' if fortran_order else 'C')
 
 
-def _to_int(obj):
-    """Change keys of a dictionary from string to int when possible."""
-    for key in list(obj.keys()):
-        try:
-            if float(key).is_integer():
-                new_key = int(float(key))
-        except:
-            new_key = key
-        if new_key != key:
-            obj[new_key] = obj[key]
-            del obj[key]
-    return obj
+_number_pattern = re.compile(r'[+-]?(?:\d+(\.\d*)?|(\.\d+))([eE][+-]?\d+)?')
+"""Numeric strings. Groups are None for integers."""
+
 
+def _dict_from_pairs(key_type):
+    """Return function that builds a dictionary converting numeric keys.
 
-def load_obj(filepath, dict_keys_to_int=False):
+    Args:
+        key_type (str): 'int' converts only keys with integer values (e.g.,
+            '2' and '2.0' to 2), 'float' converts all numeric keys to float,
+            and 'auto' converts integers to int and other numbers to float
+            (e.g., '2' to 2, and '2.0' to 2.0).
+
+    Returns:
+        function that takes a list of (key, value) pairs and returns a dict.
+    """
+    match = _number_pattern.fullmatch
+
+    if key_type == 'int':
+        def convert(key):
+            m = match(key)
+            if m is None:
+                return key
+            if m.groups() == (None, None, None):
+                return int(key)
+            number = float(key)
+            if number.is_integer():
+                return int(number)
+            return key
+        # str.isdecimal is a fast path for the most common keys (0, 1, 2, ...)
+        return lambda pairs: {int(key) if key.isdecimal() else convert(key): value for key, value in pairs}
+    elif key_type == 'float':
+        def convert(key):
+            if match(key) is None:
+                return key
+            return float(key)
+        return lambda pairs: {float(key) if key.isdecimal() else convert(key): value for key, value in pairs}
+    elif key_type == 'auto':
+        def convert(key):
+            m = match(key)
+            if m is None:
+                return key
+            if m.groups() == (None, None, None):
+                return int(key)
+            return float(key)
+        return lambda pairs: {int(key) if key.isdecimal() else convert(key): value for key, value in pairs}
+    else:
+        raise ValueError(f"key_type must be 'int', 'float', or 'auto', not '{key_type}'.")
+
+
+def load_obj(filepath, dict_keys_to_int=False, mmap=True, key_type=None):
     """Load object (array, dictionary, list, etc...) from a txt file.
 
     Args:
         filepath (str or pathlib.Path): file path to load.
         dict_keys_to_int (bool, optional): If True, it will change ALL
             numeric dict keys (even for key in nested dictionarys to int, e.g.,
-            dictObject["0.0"] will turn into dictObject[0].
+            dictObject["0.0"] will turn into dictObject[0]. Same as
+            ``key_type='int'``.
+        mmap (bool, optional): If True, numpy arrays saved in binary format
+            (see :py:func:`save_obj`) are memory mapped (read-only), i.e.,
+            data is only read from disk when used. If False, or if arrays
+            were saved compressed, arrays are read into memory.
+        key_type (str, optional): conversion of numeric dict keys (including
+            nested dictionaries). 'int' converts keys with integer values
+            ("2" and "2.0" to 2), 'float' converts all numeric keys to float,
+            and 'auto' converts integers to int and other numbers to float
+            ("2" to 2, "2.5" and "2.0" to float). If None, keys are not converted.
 
     Returns:
         object.
@@ -309,20 +1521,54 @@ def load_obj(filepath, dict_keys_to_int=False):
         :py:func:`save_obj`
     """
     filepath = Path(filepath)
-
-    with open(str(filepath), 'r') as file:
-        if dict_keys_to_int:
-            obj = json.load(file, object_hook=_to_int)
-        else:
-            obj = json.load(file)
+    sidecar = _obj_sidecar(filepath)
+    if dict_keys_to_int and key_type is None:
+        key_type = 'int'
+    from_pairs = dict if key_type is None else _dict_from_pairs(key_type)
+
+    zfile = None
+    def object_pairs_hook(pairs):
+        nonlocal zfile
+        if len(pairs) == 1 and pairs[0][0] == '__ndarray__':
+            name = pairs[0][1]
+            if zfile is None:
+                zfile = zipfile.ZipFile(sidecar)
+            array = _npz_memmap(zfile, name) if mmap else None
+            if array is None:
+                with zfile.open(name + '.npy') as file:
+                    array = np.lib.format.read_array(file)
+            return array
+        return from_pairs(pairs)
+
+    try:
+        with _open(str(filepath), 'r') as file:
+            if key_type is not None or sidecar.exists():
+                obj = json.load(file, object_pairs_hook=object_pairs_hook)
+            else:
+                obj = json.load(file)
+    finally:
+        if zfile is not None:
+            zfile.close()
     return obj
 
 
-def load_Comments(filepath, comment_flag='#', stop_flag='#'):
+_comments_cache = collections.OrderedDict()
+"""Results of :py:func:`load_Comments` keyed by (path, size, mtime, flags)."""
+
+comments_cache_size = 10000
+"""Maximum number of files in the :py:func:`load_Comments` cache."""
+
+
+def load_Comments(filepath, comment_flag='#', stop_flag='#', cache=True):
     """Return comments from text files.
 
     Comments must be indicated at the begining of the line by the comment flag.
 
+    The file is memory mapped and comment lines are found by searching the
+    raw bytes, so only comment lines are decoded. Compressed files are read
+    line by line instead. Results are cached by file path, size, and
+    modification time.
+
     Args:
         filepath (str or pathlib.Path): fullpath to file
         comment_flag (str, optional): string that indicate line is a comment.
@@ -332,39 +1578,28 @@ def load_Comments(filepath, comment_flag='#', stop_flag='#'):
             equal to `comment_flag` it will read from the first line with
             `comment_flag` and keep reading until `comment_flag` does not apper
             anymore (useful to read comments at the beginning of a file).
+        cache (bool, optional): if True, cached results are used if file did
+            not change.
 
     Returns:
         list with comments or False if no comment is found.
+
+    See Also:
+        :py:func:`load_data`
     """
-    comments = []
-    filepath = str(Path(filepath))
-    l = len(comment_flag)
-
-    if stop_flag is None:
-        with open(filepath) as file:
-            for line in file:
-                if line[0:l] == comment_flag:
-                    comments.append(line[:])
-    elif stop_flag == comment_flag:
-        with open(filepath) as file:
-            comment_started = 0
-            for line in file:
-                if line[0:l] == comment_flag and comment_started == 0:
-                    comments.append(line[:])
-                    comment_started = 1
-                elif line[0:l] == comment_flag and comment_started == 1:
-                    comments.append(line[:])
-                elif line[0:l] != comment_flag and comment_started == 1:
-                    break
+    filepath = Path(filepath)
+    stat_result = filepath.stat()
+    key = (os.path.abspath(filepath), stat_result.st_size, stat_result.st_mtime_ns, comment_flag, stop_flag)
+
+    if cache and key in _comments_cache:
+        _comments_cache.move_to_end(key)
+        comments = _comments_cache[key]
     else:
-        with open(fullpath) as file:
-            for line in file:
-                if line[0:len(stop_flag)] != stop_flag:
-                    if line[0:len(comment_flag)] == comment_flag:
-                        comments.append(line[:])
-                else:
-                    comments.append(line[:])
-                    break
+        comments = _scan_comments(filepath, comment_flag, stop_flag)
+        if cache:
+            _comments_cache[key] = comments
+            while len(_comments_cache) > comments_cache_size:
+                _comments_cache.popitem(last=False)
 
     if comments == []:
         return False
@@ -372,12 +1607,136 @@ def load_Comments(filepath, comment_flag='#', stop_flag='#'):
         return comments[:]
 
 
-def save_data(obj, filepath='./untitled.txt', add_labels=True, data_format='% .10e', header='', footer='', delimiter=', ', comment_flag='# ', newline='\n', check_overwrite=False):
+def _scan_comments(filepath, comment_flag='#', stop_flag='#'):
+    """Return comment lines of a file (see :py:func:`load_Comments`) by searching bytes of the memory mapped file."""
+    encoding = locale.getpreferredencoding(False)
+    flag = comment_flag.encode(encoding)
+
+    if _compression(filepath) is not None:
+        with _open(filepath, 'rb') as file:
+            lines = _comment_lines(file, flag, None if stop_flag is None else stop_flag.encode(encoding), stop_flag == comment_flag)
+        return [line.decode(encoding).replace('\r\n', '\n') for line in lines]
+
+    with open(filepath, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+
+            def find_line(flag, start):
+                """Position of the first line starting with flag (at or after position start)."""
+                if start == 0:
+                    if mm[:len(flag)] == flag:
+                        return 0
+                    i = mm.find(b'\n' + flag)
+                else:
+                    i = mm.find(b'\n' + flag, start - 1)
+                return -1 if i == -1 else i + 1
+
+            def line_end(start):
+                i = mm.find(b'\n', start)
+                return size if i == -1 else i + 1
+
+            lines = []
+            if stop_flag == comment_flag:
+                start = find_line(flag, 0)
+                while start != -1 and start < size and mm[start:start+len(flag)] == flag:
+                    end = line_end(start)
+                    lines.append(mm[start:end])
+                    start = end
+            else:
+                if stop_flag is None:
+                    stop = -1
+                else:
+                    stop = find_line(stop_flag.encode(encoding), 0)
+                limit = size if stop == -1 else stop
+
+                start = find_line(flag, 0)
+                while start != -1 and start < limit:
+                    end = line_end(start)
+                    lines.append(mm[start:end])
+                    start = find_line(flag, end) if end < size else -1
+                if stop != -1:
+                    lines.append(mm[stop:line_end(stop)])
+
+    return [line.decode(encoding).replace('\r\n', '\n') for line in lines]
+
+
+def _comment_lines(file, flag, stop_flag=None, header_only=True):
+    """Return comment lines of a binary file object line by line (see :py:func:`_scan_comments`)."""
+    lines = []
+    if header_only:
+        for line in file:
+            if line.startswith(flag):
+                lines.append(line)
+            elif lines:
+                break
+    else:
+        for line in file:
+            if stop_flag is not None and line.startswith(stop_flag):
+                lines.append(line)
+                break
+            elif line.startswith(flag):
+                lines.append(line)
+    return lines
+
+
+def _read_header(file, comment_flag='#'):
+    """Read the comments at the beginning of an open text file.
+
+    The file is read line by line until the first data line is found, so the
+    file position is left right after the header.
+
+    Args:
+        file (file object): text file opened for reading.
+        comment_flag (str, optional): string that indicate line is a comment.
+
+    Returns:
+        list with comments (or False if no comment is found), the first data
+        line (empty string if there is no data), and the file position where
+        data starts.
+    """
+    comments = []
+    header_ended = False
+    while True:
+        position = file.tell()
+        line = file.readline()
+        if line == '':
+            break
+        elif line.startswith(comment_flag):
+            if not header_ended:
+                comments.append(line)
+        elif line.strip() == '':
+            if comments:
+                header_ended = True
+        else:
+            break
+
+    if comments == []:
+        comments = False
+    return comments, line, position
+
+
+def save_data(obj, filepath='./untitled.txt', add_labels=True, data_format='% .10e', header='', footer='', delimiter=', ', comment_flag='# ', newline='\n', check_overwrite=False, append=False, compresslevel=None, chunks=True, compression=None, skip_unchanged=False):
     r"""Save an array or a dictionary in a txt file.
 
+    If filepath ends with ``.npy`` or ``.npz``, data is saved in numpy binary
+    format instead (text formatting arguments are ignored). A dictionary is
+    saved as a structured array (``.npy``) or as one array per key
+    (``.npz``, the header is also saved). Both can be read back with
+    :py:func:`load_data`. If filepath ends with ``.gz``, ``.bz2``, ``.xz``, or
+    ``.zst``, the text file is compressed while it is written.
+
+    If filepath ends with ``.h5``, ``.hdf5``, or ``.hdf``, data is saved in
+    HDF5 format (requires h5py). Each dictionary key is saved as a dataset
+    (arrays are saved as a dataset named ``data``), which can have any
+    number of dimensions, and the header is saved as a file attribute.
+    Datasets are chunked and can be compressed, so :py:func:`load_data` can
+    read a subset of columns or rows without reading the whole file.
+
     Args:
-        obj (dict, list, or numpy.array): data to be saved to a file. If obj is
-        a dictonary, use ``*`` in front of a key to do not save it to the file.
+        obj (dict, Dataset, list, or numpy.array): data to be saved to a file. If obj is
+        a dictonary (or :py:class:`Dataset`), use ``*`` in front of a key to do not save it to the file.
         filepath (str or pathlib.Path, optional): path to save file.
         add_labels (bool, optional): When obj is a dictonary, ``add_labels=True``
             makes the dict keys to be added to the header as label for each data column.
@@ -413,12 +1772,35 @@ def save_data(obj, filepath='./untitled.txt', add_labels=True, data_format='% .1
         newline (str, optional): string to indicate new lines.
         check_overwrite (bool, optional): if True, it will check if file exists
             and ask if user want to overwrite file.
+        append (bool, optional): if True and file exists, data rows are added to
+            the end of the file (header and footer are not written). Useful
+            for logging. Only for text files.
+        compresslevel (int, optional): compression level of compressed files.
+            If None, the default level of the compression format is used.
+        chunks (bool or tuple, optional): chunk shape of HDF5 datasets. If
+            True, the chunk shape is guessed by h5py. If None, datasets are
+            not chunked. Only for HDF5 files.
+        compression (str, optional): compression filter of HDF5 datasets,
+            e.g., ``'gzip'`` (level given by compresslevel) or ``'lzf'``.
+            Only for HDF5 files.
+        skip_unchanged (bool, optional): if True, file content is built in
+            memory and the file is only written if its content changed (see
+            :py:func:`save_text`). Files are written atomically (temporary
+            file and rename).
 
     See Also:
         :py:func:`load_data`
     """
     filepath = Path(filepath)
 
+    if append and filepath.suffix in binary_extensions + hdf5_extensions:
+        raise ValueError('append=True is only possible for text files.')
+    if append and filepath.is_file():
+        header = ''
+        footer = ''
+        add_labels = False
+        check_overwrite = False
+
     if check_overwrite:
         if filepath.exists() == True:
             if filepath.is_file() == True:
@@ -431,10 +1813,17 @@ def save_data(obj, filepath='./untitled.txt', add_labels=True, data_format='% .1
                 warnings.warn('filepath is pointing to a folder. Saving file as Untitled.txt')
                 filepath = filepath/'Untitled.txt'
 
-    if type(obj) == dict:
+    if isinstance(obj, dict):
         # remove keys that start with star (*)
         obj2 = {key: obj[key] for key in obj if str(key).startswith('*') is False}
 
+        if filepath.suffix in binary_extensions:
+            _write_file(filepath, lambda file: _save_binary(obj2, file, filepath.suffix, header=header), binary=True, skip_unchanged=skip_unchanged)
+            return
+        if filepath.suffix in hdf5_extensions:
+            _write_file(filepath, lambda file: _save_hdf5(obj2, file, header=header, chunks=chunks, compression=compression, compresslevel=compresslevel), binary=True, skip_unchanged=skip_unchanged)
+            return
+
         # col labels
         if add_labels:
             if not header == '' and not header.endswith('\n'):
@@ -443,16 +1832,445 @@ def save_data(obj, filepath='./untitled.txt', add_labels=True, data_format='% .1
                 header += str(key) + f'{delimiter}'
             header = header[:-(len(delimiter))]
 
-        # dict to array
-        obj = []
-        for key in obj2:
-            obj.append(obj2[key])
-        obj = np.array(obj).transpose()
+        if type(data_format) == dict:
+            data_format = [data_format[key] for key in obj2]
+        columns = [np.asarray(obj2[key]) for key in obj2]
+    else:
+        obj = np.asarray(obj)
+        if filepath.suffix in binary_extensions:
+            _write_file(filepath, lambda file: _save_binary(obj, file, filepath.suffix, header=header), binary=True, skip_unchanged=skip_unchanged)
+            return
+        if filepath.suffix in hdf5_extensions:
+            _write_file(filepath, lambda file: _save_hdf5(obj, file, header=header, chunks=chunks, compression=compression, compresslevel=compresslevel), binary=True, skip_unchanged=skip_unchanged)
+            return
+        if obj.ndim == 1:
+            obj = obj[:, None]
+        columns = [obj[:, i] for i in range(obj.shape[1])]
+
+    # complex numbers have special formatting in np.savetxt
+    if any([np.iscomplexobj(column) for column in columns]):
+        def write(file):
+            np.savetxt(file, np.column_stack(columns), fmt=data_format, delimiter=delimiter, newline=newline, header=header, footer=footer, comments=comment_flag)
+        if append:
+            with _open(filepath, 'a', compresslevel=compresslevel) as file:
+                write(file)
+        else:
+            _write_file(filepath, write, skip_unchanged=skip_unchanged, compresslevel=compresslevel)
+        return
+
+    # row format
+    if type(data_format) == str:
+        if data_format.count('%') == 1:
+            # text columns are written as they are
+            row_format = delimiter.join(['%s' if column.dtype.kind in 'US' else data_format for column in columns])
+        elif data_format.count('%') == len(columns):
+            row_format = data_format
+        else:
+            raise ValueError(f'data_format has wrong number of % formats: {data_format}')
+    else:
+        if len(data_format) != len(columns):
+            raise ValueError(f'data_format has {len(data_format)} formats, but data has {len(columns)} columns.')
+        row_format = delimiter.join(data_format)
+    row_format += newline
+
+    def write(file):
+        if header != '':
+            file.write(comment_flag + header.replace('\n', '\n' + comment_flag) + newline)
+        _write_rows(file, columns, row_format)
+        if footer != '':
+            file.write(comment_flag + footer.replace('\n', '\n' + comment_flag) + newline)
+
+    if append:
+        with _open(filepath, 'a', compresslevel=compresslevel, buffering=2**20) as file:
+            write(file)
+    else:
+        _write_file(filepath, write, skip_unchanged=skip_unchanged, compresslevel=compresslevel, buffering=2**20)
+
+
+def _write_rows(file, columns, row_format, values_per_block=2**17):
+    """Write data columns to file using a row format string.
+
+    Rows are formatted in blocks, i.e., one ``%`` operation for many rows,
+    which is much faster than formatting each row (or value) separately.
+
+    Args:
+        file (file object): text file opened for writing.
+        columns (list): list of 1D arrays with same length.
+        row_format (str): format string of a row (including newline).
+        values_per_block (int, optional): approximated number of values
+            formatted at once.
+    """
+    n_rows = len(columns[0]) if columns else 0
+    rows_per_block = max(1, values_per_block//max(1, len(columns)))
+    mixed = any(column.dtype.kind in 'USO' for column in columns)
+    for start in range(0, n_rows, rows_per_block):
+        if mixed:  # column_stack would turn numbers into strings
+            values = tuple(itertools.chain.from_iterable(zip(*[column[start:start+rows_per_block].tolist() for column in columns])))
+        else:
+            values = tuple(np.column_stack([column[start:start+rows_per_block] for column in columns]).ravel().tolist())
+        file.write((row_format*(len(values)//max(1, len(columns)))) % values)
+
+
+def _save_binary(obj, file, suffix, header=''):
+    """Save array or dictionary in numpy binary format (suffix .npy or .npz) to a binary file object."""
+    if suffix == '.npz':
+        if isinstance(obj, dict):
+            arrays = {str(key): np.asarray(obj[key]) for key in obj}
+        else:
+            arrays = {'data': obj}
+        if header != '':
+            arrays['__header__'] = np.array(header)
+        np.savez(file, **arrays)
+    else:
+        if isinstance(obj, dict):
+            columns = [np.asarray(obj[key]) for key in obj]
+            dtype = [(str(key), column.dtype) for key, column in zip(obj, columns)]
+            data = np.empty(len(columns[0]), dtype=dtype)
+            for key, column in zip(obj, columns):
+                data[str(key)] = column
+            obj = data
+        np.save(file, obj)
+
+
+def _load_binary(filepath, labels=None, force_array=False):
+    """Load data saved by :py:func:`save_data` in numpy binary format. See :py:func:`load_data`."""
+    if filepath.suffix == '.npz':
+        with np.load(filepath) as file:
+            data = {key: file[key] for key in file.files if key != '__header__'}
+        if list(data.keys()) == ['data']:
+            data = data['data']
+    else:
+        data = np.load(filepath)
+        if data.dtype.names is not None:
+            data = {name: data[name] for name in data.dtype.names}
+
+    if type(data) == dict:
+        if force_array:
+            return np.column_stack(list(data.values()))
+        if labels is not None:
+            data = {label: column for label, column in zip(labels, data.values())}
+        return {key: data[key] for key in data if not str(key).startswith('*')}
+    elif labels is not None and not force_array:
+        return {labels[i]: data[:, i] for i in range(len(labels)) if not labels[i].startswith('*')}
+    return data
+
+
+def _save_hdf5(obj, file, header='', chunks=True, compression=None, compresslevel=None):
+    """Save array or dictionary in HDF5 format to a binary file object. See :py:func:`save_data`."""
+    if h5py is None:
+        raise ModuleNotFoundError('HDF5 files require the h5py package (pip install h5py).')
+    if isinstance(obj, dict):
+        arrays = {str(key): np.asarray(obj[key]) for key in obj}
+    else:
+        arrays = {'data': obj}
+
+    with h5py.File(file, 'w') as file:
+        if header != '':
+            file.attrs['header'] = header
+        if isinstance(obj, dict):
+            file.attrs['labels'] = list(arrays.keys())
+        for key, array in arrays.items():
+            dtype = array.dtype
+            if array.dtype.kind in 'USO':
+                array = array.astype(str).astype(object)
+                dtype = h5py.string_dtype()
+            options = {}
+            if array.size > 0 and array.ndim > 0:  # scalars and empty arrays cannot be chunked
+                options = {'chunks': chunks, 'compression': compression}
+                if compression == 'gzip':
+                    options['compression_opts'] = compresslevel
+            file.create_dataset(key, data=array, dtype=dtype, **options)
+
+
+def _load_hdf5(filepath, labels=None, force_array=False, columns=None, rows=None, dataset=False):
+    """Load data saved by :py:func:`save_data` in HDF5 format. See :py:func:`load_data`.
+
+    Only the selected columns and rows are read from the file.
+    """
+    if h5py is None:
+        raise ModuleNotFoundError('HDF5 files require the h5py package (pip install h5py).')
+    if rows is None:
+        rows = slice(None)
+
+    def read(d, selection=()):
+        if d.ndim == 0:
+            return d[()]
+        if h5py.check_string_dtype(d.dtype) is not None:
+            return np.array(d.asstr()[(rows, ) + selection], dtype=str)
+        return d[(rows, ) + selection]
+
+    with h5py.File(filepath, 'r') as file:
+        if 'labels' not in file.attrs:
+            d = file['data']
+            if columns is None:
+                data = read(d)
+            else:
+                # hyperslab indexes must be increasing
+                columns = np.atleast_1d(columns)
+                order = np.argsort(columns)
+                data = read(d, (columns[order].tolist(), ))[..., np.argsort(order)]
+            if labels is not None and not force_array:
+                return {labels[i]: data[:, i] for i in range(len(labels)) if not labels[i].startswith('*')}
+            return data
+
+        keys = [str(key) for key in file.attrs['labels']]
+        if columns is not None:
+            keys = [keys[column] if isinstance(column, (int, np.integer)) else column for column in columns]
+        data = {key: read(file[key]) for key in keys}
+
+    if force_array:
+        return np.column_stack(list(data.values()))
+    if labels is not None:
+        data = {label: column for label, column in zip(labels, data.values())}
+    data = {key: data[key] for key in data if not str(key).startswith('*')}
+    if dataset and all(np.ndim(column) == 1 for column in data.values()):
+        return Dataset(data)
+    return data
+
+
+def _parse_data(file, data_start, delimiter=None, comment_flag='#', engine='auto', ndmin=0):
+    """Parse numeric data from an open text file.
+
+    Args:
+        file (file object): text file opened for reading.
+        data_start (int): file position where data starts.
+        delimiter (str, optional): string used to separate data values. If
+            None, consecutive whitespaces act as delimiter.
+        comment_flag (str, optional): string indicating comments.
+        engine (str, optional): 'loadtxt', 'genfromtxt', or 'auto'. See
+            :py:func:`load_data`.
+        ndmin (int, optional): minimum number of dimensions of the array.
+
+    Returns:
+        array.
+    """
+    if engine not in ('auto', 'loadtxt', 'genfromtxt'):
+        raise ValueError(f"engine must be 'auto', 'loadtxt' or 'genfromtxt', not '{engine}'.")
+
+    if engine in ('auto', 'loadtxt'):
+        fast_delimiter = _fast_delimiter(delimiter, engine)
+        if fast_delimiter is not False:
+            file.seek(data_start)
+            try:
+                return np.loadtxt(_lines(file), delimiter=fast_delimiter, comments=comment_flag, ndmin=ndmin)
+            except ValueError:  # missing values, strings, or irregular rows
+                if engine == 'loadtxt':
+                    raise
+
+    file.seek(data_start)
+    return np.genfromtxt(_lines(file), delimiter=delimiter, comments=comment_flag, ndmin=ndmin)
+
+
+def _fast_delimiter(delimiter, engine='auto'):
+    """Return delimiter for np.loadtxt, which only accepts single characters.
+
+    Delimiters like ``', '`` are reduced to ``','``. Returns False if the
+    delimiter cannot be used (error is raised if engine is 'loadtxt').
+    """
+    if delimiter is not None and len(delimiter) > 1 and len(delimiter.strip()) == 1:
+        delimiter = delimiter.strip()
+    if delimiter is None or len(delimiter) == 1:
+        return delimiter
+    if engine == 'loadtxt':
+        raise ValueError(f'loadtxt engine cannot handle delimiter {repr(delimiter)}.')
+    return False
+
+
+def _parse_columns(file, data_start, labels, types=None, delimiter=None, comment_flag='#', engine='auto'):
+    """Parse data columns of an open text file into a :py:class:`Dataset`.
+
+    All columns are parsed in a single pass. Numeric columns are stored as
+    rows of a single column-major float array (so each column is
+    contiguous) and text columns as fixed-width string arrays (leading and
+    trailing spaces removed). Columns with labels starting with ``*`` are
+    not parsed.
+
+    Args:
+        file (file object): text file opened for reading.
+        data_start (int): file position where data starts.
+        labels (list): column labels.
+        types (list, optional): type of each column, 'float' or 'str' (see
+            :py:func:`format_profile`). If None, all columns are expected
+            to be numeric.
+        delimiter (str, optional): string used to separate data values.
+        comment_flag (str, optional): string indicating comments.
+        engine (str, optional): see :py:func:`load_data`.
+
+    Returns:
+        :py:class:`Dataset`.
+    """
+    if engine not in ('auto', 'loadtxt', 'genfromtxt'):
+        raise ValueError(f"engine must be 'auto', 'loadtxt' or 'genfromtxt', not '{engine}'.")
+    if types is None or len(types) < len(labels):
+        types = ['float']*len(labels)
+    usecols = [i for i, label in enumerate(labels) if not label.startswith('*')]
+    numeric = [i for i in usecols if types[i] == 'float']
+    text = [i for i in usecols if types[i] != 'float']
+    if not usecols:
+        return Dataset()
+
+    if engine in ('auto', 'loadtxt'):
+        fast_delimiter = _fast_delimiter(delimiter, engine)
+        if fast_delimiter is not False:
+            file.seek(data_start)
+            try:
+                if not text:
+                    data = np.loadtxt(_lines(file), delimiter=fast_delimiter, comments=comment_flag, usecols=usecols, ndmin=2)
+                    return Dataset._from_block(data.T.copy(), [labels[i] for i in usecols])
+
+                # text columns are read as python strings in the same pass
+                dtype = [(str(i), float if types[i] == 'float' else object) for i in usecols]
+                data = np.loadtxt(_lines(file), delimiter=fast_delimiter, comments=comment_flag, usecols=usecols, dtype=dtype, ndmin=1)
+                block = np.empty((len(numeric), len(data)))
+                for j, i in enumerate(numeric):
+                    block[j] = data[str(i)]
+                strings = {labels[i]: np.char.strip(data[str(i)].astype(str)) for i in text}
+                return Dataset._from_block(block, [labels[i] for i in usecols], strings)
+            except ValueError:  # missing values, or text in a numeric column
+                if engine == 'loadtxt':
+                    raise
+
+    # everything is read as text, then numeric columns are converted
+    # (missing or invalid values become nan)
+    file.seek(data_start)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # empty file
+        data = np.genfromtxt(_lines(file), delimiter=delimiter, comments=comment_flag, usecols=usecols, dtype=str, autostrip=True, ndmin=2)
+    if data.size == 0:
+        data = np.zeros((0, len(usecols)), dtype=str)
+
+    block = np.empty((len(numeric), len(data)))
+    strings = {}
+    for j, i in enumerate(usecols):
+        if types[i] == 'float':
+            column = data[:, j]
+            try:
+                block[numeric.index(i)] = np.where(column == '', 'nan', column).astype(float)
+            except ValueError:
+                block[numeric.index(i)] = [_to_float(value) for value in column]
+        else:
+            strings[labels[i]] = data[:, j]
+    return Dataset._from_block(block, [labels[i] for i in usecols], strings)
+
+
+def _to_float(value):
+    """Return value as float (nan if value is not a number)."""
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+class Dataset(dict):
+    """Data columns stored in a single column-major array.
 
-    np.savetxt(filepath, obj, fmt=data_format, delimiter=delimiter, newline=newline, header=header, footer=footer, comments=comment_flag)
+    A Dataset is a dictionary ``{label: column}`` (it can be used wherever
+    the dictionaries returned by :py:func:`load_data` are used), but the
+    numeric columns are rows of a single 2D array (``Dataset.block``, with
+    shape columns x rows). Each column is contiguous in memory, which makes
+    column-wise operations faster than on columns of a row-major array.
+    Text (and complex) columns are stored as separate arrays.
 
+    Columns are accessed by label and rows by slices, both without copying
+    data.
 
-def load_data(filepath, delimiter=None, comment_flag='#', labels=None, force_array=False):
+    Example:
+        >>> ds = fm.load_data('scan_1.dat', dataset=True)
+        >>> ds['x']         # contiguous column
+        >>> ds[100:200]     # Dataset with rows 100 to 199
+        >>> ds.array        # numeric columns as a 2D array (rows x columns)
+        >>> fm.save_data(ds[100:200], 'cut.dat')
+
+    Args:
+        data (dict or array, optional): dictionary ``{label: column}`` or a
+            2D array (rows x columns). Data is copied.
+        labels (list, optional): column labels. Default are the keys of
+            data (if dictionary). Labels starting with ``*`` are excluded.
+
+    See Also:
+        :py:func:`load_data`, :py:func:`save_data`
+    """
+
+    def __init__(self, data=None, labels=None):
+        super().__init__()
+        self.block = np.empty((0, 0))
+        if data is None:
+            return
+
+        if isinstance(data, dict):
+            columns = [np.asarray(data[key]) for key in data]
+            if labels is None:
+                labels = list(data.keys())
+        else:
+            data = np.asarray(data)
+            if data.ndim == 1:
+                data = data[:, None]
+            columns = [data[:, i] for i in range(data.shape[1])]
+            if labels is None:
+                raise ValueError('labels must be given if data is an array.')
+        if len(labels) != len(columns):
+            raise ValueError(f'data has {len(columns)} columns, but {len(labels)} labels were given.')
+
+        columns = {label: column for label, column in zip(labels, columns) if not str(label).startswith('*')}
+        others = {label: columns[label] for label in columns if columns[label].dtype.kind not in 'biuf'}
+        numeric = [label for label in columns if label not in others]
+        block = np.empty((len(numeric), len(next(iter(columns.values()))) if columns else 0))
+        for j, label in enumerate(numeric):
+            block[j] = columns[label]
+        self._fill(block, list(columns.keys()), others)
+
+    @classmethod
+    def _from_block(cls, block, labels, others=None):
+        """Return Dataset without copying data (see :py:meth:`_fill`)."""
+        ds = cls()
+        ds._fill(block, labels, others)
+        return ds
+
+    def _fill(self, block, labels, others=None):
+        """Set columns.
+
+        Args:
+            block (array): numeric columns (columns x rows).
+            labels (list): labels of all columns in order.
+            others (dict, optional): non-numeric columns ``{label: column}``.
+                Labels not in others are assigned to the rows of block in
+                order.
+        """
+        if others is None:
+            others = {}
+        self.block = block
+        j = 0
+        for label in labels:
+            if label in others:
+                self[label] = others[label]
+            else:
+                self[label] = block[j]
+                j += 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            ds = Dataset()
+            ds.block = self.block[:, key]
+            for label, column in self.items():
+                ds[label] = column[key]
+            return ds
+        return dict.__getitem__(self, key)
+
+    @property
+    def labels(self):
+        """List of column labels."""
+        return list(self.keys())
+
+    @property
+    def array(self):
+        """Numeric columns as a 2D array (rows x columns), without copying data."""
+        return self.block.T
+
+    def __repr__(self):
+        return f'Dataset({dict.__repr__(self)})'
+
+
+def load_data(filepath, delimiter=None, comment_flag='#', labels=None, force_array=False, engine='auto', cache=False, profile=None, dataset=False, columns=None, rows=None):
     """Load data from text file. Data is formated in a dictionary or array.
 
     The dictionary keys are set as the label of the corresponding data columns, where
@@ -468,72 +2286,1203 @@ def load_data(filepath, delimiter=None, comment_flag='#', labels=None, force_arr
             If the file has a header, and if the header has a line with the column labels, it
             tries to guess the delimiter of this line. If it cannot, it tries
             to use the same delimiter for the data and for the leader in the header.
+            Guessed delimiters and labels are cached by file layout (see
+            :py:func:`format_profile`), so files with the same header and
+            columns are not guessed again.
         comment_flag (str, optional): string indicating comments.
         labels (list, optional): It forces data to be loaded as a dictionary where
             each label is associated with a data column. Its lenght must have the same as the number of
             columns. To avoid importing a column, put an asterisk (*) in front of the corresponding label.
         force_array (bool, optional): If ``force_array=True``, data it will be returned in a array.
+        engine (str, optional): parser used for the data. ``'loadtxt'`` uses
+            ``np.loadtxt``, which is much faster (C-accelerated in numpy >= 1.23),
+            but fails if there are missing values or text columns. ``'genfromtxt'``
+            uses ``np.genfromtxt``, which handles missing values (as ``nan``).
+            ``'auto'`` tries ``'loadtxt'`` first and falls back to
+            ``'genfromtxt'`` only if needed.
+        cache (bool, str or pathlib.Path, optional): If True, parsed data is
+            saved to a binary sidecar file next to the data file
+            (``.<filename>.cache.npy``). If a directory path, cache entries are
+            saved in this directory, which is kept under ``cache_max_size``
+            bytes by removing the least recently used entries. Cache entries are
+            keyed by the file path, size, and modification time (and the
+            arguments of this function). Next calls memory map the cached data
+            instead of parsing the text file again.
+        profile (dict, optional): format profile returned by
+            :py:func:`format_profile`. Delimiter and labels of the profile
+            are used and nothing is guessed. If delimiter is also given, it
+            replaces the delimiter of the profile.
+        dataset (bool, optional): if True, data is returned as a
+            :py:class:`Dataset` instead of a dictionary (numeric columns are
+            stored in a single column-major array).
+        columns (list, optional): labels or indexes of the columns to load.
+            Only for HDF5 files.
+        rows (int or slice, optional): rows to load, e.g.,
+            ``slice(1000, 2000)``. Only for HDF5 files.
 
     Returns:
-        Dictionary or array.
+        Dictionary or array. Dictionary values are float arrays for numeric
+        columns and string arrays for text columns (column types are guessed
+        from the first lines of the file, see :py:func:`format_profile`).
+        All columns are read in a single pass over the file.
+
+    Note:
+        Files with extension ``.npy`` and ``.npz`` (see :py:func:`save_data`)
+        are loaded directly from numpy binary format, and files with extension
+        ``.h5``, ``.hdf5``, and ``.hdf`` from HDF5 format, where only the
+        chunks with the selected columns and rows are read (see
+        :py:func:`save_data`). Compressed text files
+        (gzip, bz2, xz, zstd, see ``compression_extensions``) are
+        decompressed on the fly while they are parsed.
 
     See Also:
         :py:func:`save_data`.
     """
     filepath = Path(filepath)
 
-    # guess delimiter
-    if delimiter is None:
-        header = load_Comments(filepath, comment_flag=comment_flag, stop_flag=comment_flag)
-        try: line_number = len(header)
-        except TypeError: line_number = 0
-        f = open(filepath)
-        for i, line in enumerate(f):
-            if i == line_number:
-                delimiter = detect(line)
-            elif i > line_number:
-                break
-        f.close()
+    if filepath.suffix in binary_extensions:
+        return _load_binary(filepath, labels=labels, force_array=force_array)
+    if filepath.suffix in hdf5_extensions:
+        return _load_hdf5(filepath, labels=labels, force_array=force_array, columns=columns, rows=rows, dataset=dataset)
+    if columns is not None or rows is not None:
+        raise ValueError('columns and rows are only possible for HDF5 files.')
+
+    if cache:
+        return _load_data_cached(filepath, cache, dataset=dataset, delimiter=delimiter, comment_flag=comment_flag, labels=labels, force_array=force_array, engine=engine, profile=profile)
+
+    with _open(filepath) as file:
+        # header and first data line (file is read only once)
+        header, first_line, data_start = _read_header(file, comment_flag=comment_flag)
+        if profile is None:
+            profile = _cached_profile(file, header, first_line, comment_flag=comment_flag, delimiter=delimiter)
+        if delimiter is None:
+            delimiter = profile['delimiter']
+        elif delimiter == ' ':
+            delimiter = None
+
+        # get labels
+        if labels is None and not force_array:
+            if header is False:
+                warnings.warn('Cannot find header. Importing data as an array.')
+            else:
+                labels = profile['labels']
+                if labels is None:
+                    warnings.warn('Cannot find column labels. Importing data as an array.')
+
+        # get data (2D, so single column files are also arrays of columns)
+        if labels is None:
+            return np.squeeze(_parse_data(file, data_start, delimiter=delimiter, comment_flag=comment_flag, engine=engine, ndmin=2))
+        data = _parse_columns(file, data_start, labels, profile['types'], delimiter=delimiter, comment_flag=comment_flag, engine=engine)
+        return data if dataset else dict(data)
+
+
+def _find_labels(header, n_cols, delimiter=None, comment_flag='#'):
+    """Return column labels from the last header line.
+
+    Args:
+        header (list): header lines.
+        n_cols (int): number of data columns.
+        delimiter (str, optional): data delimiter, used if the delimiter of the
+            label line cannot be guessed.
+        comment_flag (str, optional): string indicating comments.
+
+    Returns:
+        list with labels or None if labels cannot be found.
+    """
+    header_line = header[-1].replace(comment_flag, '').strip()
+    header_line = header_line.replace('\n', '')
+    header_delimiter = detect(header_line)
+    labels = header_line.split(header_delimiter)
+    if len(labels) != n_cols:
+        labels = header_line.split(delimiter)
+        if len(labels) != n_cols:
+            return None
+    # remove empty itens and trailing spaces
+    return [item.strip() for item in labels if item != '']
+
+
+_delimiter_candidates = (',', ';', ':', '|', '\t')
+
+_profile_cache = collections.OrderedDict()
+"""Format profiles (see :py:func:`format_profile`) keyed by file layout."""
+
+profile_cache_size = 1000
+"""Maximum number of file layouts in the format profile cache."""
+
+
+def _detect_delimiter(lines):
+    """Return delimiter (None for whitespaces) and confidence from sampled data lines.
+
+    For each candidate delimiter present in the first line, the number of
+    fields of each line is counted. The confidence is the fraction of lines
+    with the most common number of fields, and the candidate with the
+    highest confidence is chosen (ties are broken by the order of
+    ``_delimiter_candidates``). If no candidate is present, whitespaces are
+    used. If the first line cannot be split at all and it is not a number,
+    the delimiter is guessed by ``detect_delimiter.detect``.
+
+    Args:
+        lines (list): data lines.
+
+    Returns:
+        delimiter, confidence (between 0 and 1).
+    """
+    if not lines:
+        return None, 0
+
+    best, best_confidence = None, 0
+    for candidate in _delimiter_candidates:
+        if candidate not in lines[0]:
+            continue
+        c = _confidence([line.count(candidate) for line in lines])
+        if c > best_confidence:
+            best, best_confidence = candidate, c
+    if best is not None:
+        return best, best_confidence
+
+    counts = [len(line.split()) for line in lines]
+    if counts[0] == 1 and len(lines[0].strip()) > 0:
+        # single column of numbers (detect guesses '+' or '-' from exponents)
+        try:
+            float(lines[0])
+            return None, _confidence(counts)
+        except ValueError:
+            pass
+        delimiter = detect(lines[0].strip())
         if delimiter is None:
             warnings.warn('Could not figure out the delimiter. Trying space.')
-    if delimiter == ' ':
-        delimiter = None
+        elif delimiter != ' ':
+            return delimiter, _confidence([line.count(delimiter) for line in lines])
+    return None, _confidence(counts)
 
-    # get data
-    data = np.genfromtxt(str(filepath), delimiter=delimiter, comments=comment_flag)
 
-    # get labels
-    header = load_Comments(filepath, comment_flag=comment_flag, stop_flag=comment_flag)
-    if labels is None:
-        if header is False:
-            warnings.warn('Cannot find header. Importing data as an array.')
-            return data
-        elif force_array:
-            return data
-        else:
-            header_line = header[-1].replace(comment_flag, '').strip()
-            header_line = header_line.replace('\n', '')
-            header_delimiter = detect(header_line)
-            labels = header_line.split(header_delimiter)
-            if len(labels) != data.shape[1]:
-                labels = header_line.split(delimiter)
-                if len(labels) != data.shape[1]:
+def _confidence(counts):
+    """Return the fraction of lines with the most common number of fields."""
+    if not counts:
+        return 0
+    mode = max(set(counts), key=counts.count)
+    return counts.count(mode)/len(counts)
+
+
+def _column_types(lines, delimiter, n_cols):
+    """Return the type of each column ('float' or 'str') from sampled data lines.
+
+    A column is 'str' if any of its (non empty) values is not a number.
+    """
+    types = ['float']*n_cols
+    for line in lines:
+        for i, field in enumerate(line.split(delimiter)[:n_cols]):
+            if types[i] == 'float':
+                try:
+                    float(field)
+                except ValueError:
+                    if field.strip() != '':
+                        types[i] = 'str'
+    return types
+
+
+def _sample_lines(file, first_line, comment_flag='#', n_lines=20):
+    """Return first n_lines data lines of an open text file positioned right after first_line."""
+    lines = [first_line] if first_line.strip() != '' else []
+    while 0 < len(lines) < n_lines:
+        line = file.readline()
+        if line == '':
+            break
+        if line.strip() != '' and not line.startswith(comment_flag):
+            lines.append(line)
+    return lines
+
+
+def _profile(file, header, first_line, comment_flag='#', delimiter=None, n_lines=20):
+    """Return the format profile of an open text file (see :py:func:`format_profile`).
+
+    Args:
+        file (file object): text file, positioned right after first_line.
+        header (list): header lines (or False).
+        first_line (str): first data line.
+        comment_flag (str, optional): string indicating comments.
+        delimiter (str, optional): data delimiter (' ' for whitespaces). If
+            None, it is guessed.
+        n_lines (int, optional): number of data lines used for guessing.
+
+    Returns:
+        dictionary.
+    """
+    lines = _sample_lines(file, first_line, comment_flag=comment_flag, n_lines=n_lines)
+    if delimiter is None:
+        delimiter, confidence = _detect_delimiter(lines)
+    else:
+        if delimiter == ' ':
+            delimiter = None
+        confidence = _confidence([len(line.split(delimiter)) for line in lines])
+    n_cols = len(first_line.split(delimiter)) if lines else 0
+    labels = None
+    if header is not False and n_cols > 0:
+        labels = _find_labels(header, n_cols, delimiter=delimiter, comment_flag=comment_flag)
+    return {'delimiter': delimiter,
+            'confidence': confidence,
+            'n_cols': n_cols,
+            'labels': labels,
+            'types': _column_types(lines, delimiter, n_cols)}
+
+
+def _cached_profile(file, header, first_line, comment_flag='#', delimiter=None):
+    """Return the format profile of an open text file from cache (or guess it).
+
+    Files have the same layout if they have the same label line (last
+    header line) and the same number of fields and candidate delimiters in
+    the first data line. Column types depend on the content of each file,
+    so they are always guessed from the sampled lines of the file.
+    """
+    signature = tuple(first_line.count(c) for c in _delimiter_candidates) + (len(first_line.split()), )
+    key = (comment_flag, delimiter, header[-1] if header else None, signature)
+    if key in _profile_cache:
+        _profile_cache.move_to_end(key)
+        profile = dict(_profile_cache[key])
+        lines = _sample_lines(file, first_line, comment_flag=comment_flag)
+        profile['types'] = _column_types(lines, profile['delimiter'], profile['n_cols'])
+        return profile
+
+    profile = _profile(file, header, first_line, comment_flag=comment_flag, delimiter=delimiter)
+    _profile_cache[key] = profile
+    while len(_profile_cache) > profile_cache_size:
+        _profile_cache.popitem(last=False)
+    return profile
+
+
+def format_profile(filepath, comment_flag='#', n_lines=20, delimiter=None):
+    """Guess the format of a text data file.
+
+    The delimiter and the type of each column (number or text) are guessed
+    from a sample of data lines (not only the first one) and a confidence
+    score is given for the delimiter. The profile can be passed
+    to :py:func:`load_data` (and :py:func:`iter_data`) to load files with
+    the same layout without guessing.
+
+    Example:
+        >>> profile = fm.format_profile('scan_1.dat')
+        >>> profile
+        {'delimiter': ',', 'confidence': 1.0, 'n_cols': 3, 'labels': ['x', 'y', 'z'], 'types': ['float', 'float', 'float']}
+        >>> data = [fm.load_data(f, profile=profile) for f in fm.filelist('.', 'scan_*.dat')]
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        comment_flag (str, optional): string indicating comments.
+        n_lines (int, optional): number of data lines used for guessing.
+        delimiter (str, optional): data delimiter (' ' for whitespaces). If
+            None, it is guessed.
+
+    Returns:
+        dictionary with delimiter (None for whitespaces), confidence (fraction
+        of sampled lines with the same number of fields, between 0 and 1),
+        number of columns, labels (None if labels cannot be found), and
+        types (list with 'float' or 'str' for each column).
+
+    See Also:
+        :py:func:`load_data`
+    """
+    with _open(Path(filepath)) as file:
+        header, first_line, data_start = _read_header(file, comment_flag=comment_flag)
+        return _profile(file, header, first_line, comment_flag=comment_flag, delimiter=delimiter, n_lines=n_lines)
+
+
+def iter_data(filepath, chunksize=100000, delimiter=None, comment_flag='#', labels=None, force_array=False, engine='auto', overlap=0, profile=None):
+    """Iterate over blocks of rows of a text data file.
+
+    Header, labels, and delimiter are found as in :py:func:`load_data`, but
+    only ``chunksize`` lines are read at a time, so memory usage does not
+    depend on the file size.
+
+    Example:
+        Moving average over a file larger than memory:
+
+        >>> n = 10
+        >>> for block in fm.iter_data('log.dat', overlap=n-1):
+        ...     y = np.convolve(block['y'], np.ones(n)/n, mode='valid')
+
+    Args:
+        filepath (str or pathlib.Path): path to file
+        chunksize (int, optional): number of lines in each block.
+        delimiter (str, optional): see :py:func:`load_data`.
+        comment_flag (str, optional): string indicating comments.
+        labels (list, optional): see :py:func:`load_data`.
+        force_array (bool, optional): If ``force_array=True``, blocks are arrays.
+        engine (str, optional): see :py:func:`load_data`.
+        overlap (int, optional): number of lines from the end of a block that
+            are repeated at the beginning of the next block. Useful for
+            operations across block boundaries (moving averages, derivatives).
+        profile (dict, optional): see :py:func:`load_data`.
+
+    Yields:
+        Dictionary or 2D array (rows x columns) with the data of a block.
+
+    See Also:
+        :py:func:`load_data`.
+    """
+    filepath = Path(filepath)
+    if overlap >= chunksize:
+        raise ValueError('overlap must be smaller than chunksize.')
+
+    with _open(filepath) as file:
+        header, first_line, data_start = _read_header(file, comment_flag=comment_flag)
+        if profile is None:
+            profile = _cached_profile(file, header, first_line, comment_flag=comment_flag, delimiter=delimiter)
+        if delimiter is None:
+            delimiter = profile['delimiter']
+        elif delimiter == ' ':
+            delimiter = None
+        if labels is None and not force_array:
+            if header is False:
+                warnings.warn('Cannot find header. Importing data as an array.')
+                force_array = True
+            else:
+                labels = profile['labels']
+                if labels is None:
                     warnings.warn('Cannot find column labels. Importing data as an array.')
-                    return data
-            # remove empty itens and trailing spaces
-            labels = [item.strip() for item in labels if item != '']
+                    force_array = True
+
+        file.seek(data_start)
+        file_lines = _lines(file)
+        previous = []
+        while True:
+            lines = list(itertools.islice(file_lines, chunksize - len(previous)))
+            if not lines:
+                break
+            lines = previous + lines
+            previous = lines[len(lines)-overlap:] if overlap > 0 else []
+
+            block = io.StringIO(''.join(lines))
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')  # block with comments only
+                if force_array:
+                    data = _parse_data(block, 0, delimiter=delimiter, comment_flag=comment_flag, engine=engine, ndmin=2)
+                    if data.size == 0:
+                        continue
+                else:
+                    data = dict(_parse_columns(block, 0, labels, profile['types'], delimiter=delimiter, comment_flag=comment_flag, engine=engine))
+                    if all(len(column) == 0 for column in data.values()):
+                        continue
+            yield data
 
-    # create dict
-    datadict = {labels[i]: data[:, i] for i in range(len(labels)) if not labels[i].startswith('*')}
 
-    # if a column returns only nan, this column is read as string
-    for key in datadict:
-        if False in [x for x in datadict[key] != datadict[key]]:  # test if the whole col is nan
-            pass
-        else:
-            # key conversion to col number
-            col_string = labels.index(key)
-            data = np.genfromtxt(filepath, delimiter=None, comments='#', usecols=[-1], dtype='S8')
-            datadict[key] = [x.decode('utf-8') for x in data]
+def _load_array(filepath, kwargs):
+    """Return data from :py:func:`load_data` as an array and the column labels (or None)."""
+    data = load_data(filepath, **kwargs)
+    if isinstance(data, dict):
+        return np.column_stack([np.asarray(data[key], dtype=float) for key in data]), list(data.keys())
+    return np.asarray(data), None
+
+
+def load_filelist(filelist, max_workers=None, processes=False, **kwargs):
+    """Load many data files in parallel and stack them in a single array.
+
+    Args:
+        filelist (list or dict): list of filepaths (see :py:func:`filelist`)
+            or a dictionary of filepaths (see :py:func:`parsed_filelist`).
+        max_workers (int, optional): number of parallel workers. If None, the
+            number of cpus is used.
+        processes (bool, optional): if True, files are loaded in a pool of
+            processes instead of threads. Processes avoid the GIL for parsing,
+            but on Windows and mac the calling script must be protected by
+            ``if __name__ == '__main__':``.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Returns:
+        keys (list), stack (array), labels (list), skipped (dict).
+
+        keys are the filepaths (or the dictionary keys) of the loaded files,
+        stack is an array of shape (files x rows x columns) or (files x rows),
+        labels are the column labels (None if data is not loaded as a
+        dictionary), and skipped is a dictionary ``{key: reason}`` with the
+        files that could not be loaded or have a different shape/labels from
+        the first file (in filelist order) that could be loaded.
+
+    See Also:
+        :py:func:`load_data`
+    """
+    if isinstance(filelist, dict):
+        keys = list(filelist.keys())
+        filepaths = list(filelist.values())
+    else:
+        keys = list(filelist)
+        filepaths = keys
+    if max_workers is None:
+        max_workers = os.cpu_count()
+
+    if processes:
+        Executor = concurrent.futures.ProcessPoolExecutor
+    else:
+        Executor = concurrent.futures.ThreadPoolExecutor
+
+    stack = None
+    labels = None
+    loaded = np.zeros(len(keys), dtype=bool)
+    skipped = {}
+    with Executor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_load_array, filepath, kwargs) for filepath in filepaths]
+        done = set()
+
+        # first file (in filelist order) that can be loaded defines shape and labels
+        for i, future in enumerate(futures):
+            done.add(future)
+            try:
+                data, labels = future.result()
+            except Exception as e:
+                skipped[keys[i]] = f'{type(e).__name__}: {e}'
+                continue
+            stack = np.empty((len(keys), ) + data.shape, dtype=data.dtype)
+            stack[i] = data
+            loaded[i] = True
+            break
+
+        indexes = {future: i for i, future in enumerate(futures) if future not in done}
+        for future in concurrent.futures.as_completed(indexes):
+            i = indexes[future]
+            try:
+                data, file_labels = future.result()
+            except Exception as e:
+                skipped[keys[i]] = f'{type(e).__name__}: {e}'
+                continue
+
+            if data.shape != stack.shape[1:]:
+                skipped[keys[i]] = f'shape {data.shape} differs from {stack.shape[1:]}'
+            elif file_labels != labels:
+                skipped[keys[i]] = f'labels {file_labels} differ from {labels}'
+            else:
+                stack[i] = data
+                loaded[i] = True
+
+    for key in skipped:
+        warnings.warn(f'{key} skipped: {skipped[key]}')
+
+    if stack is None:
+        return [], np.empty((0, )), None, skipped
+    if not loaded.all():
+        stack = stack[loaded]
+    return [key for i, key in enumerate(keys) if loaded[i]], stack, labels, skipped
+
+
+def _cache_paths(filepath, cache):
+    """Return the paths of the cache files (array and metadata) of a data file.
+
+    Args:
+        filepath (pathlib.Path): path to data file.
+        cache (bool, str or pathlib.Path): True for a sidecar file, or the
+            cache directory.
+
+    Returns:
+        array filepath, metadata filepath.
+    """
+    filepath = filepath.resolve()
+    if cache is True:
+        base = str(filepath.parent/('.' + filepath.name + '.cache'))
+    else:
+        cachedir = Path(cache)
+        cachedir.mkdir(parents=True, exist_ok=True)
+        base = str(cachedir/hashlib.sha1(str(filepath).encode()).hexdigest())
+    return Path(base + '.npy'), Path(base + '.json')
+
+
+def _load_data_cached(filepath, cache, dataset=False, **kwargs):
+    """Load data using the binary cache. See :py:func:`load_data`."""
+    filepath = Path(filepath)
+    array_path, meta_path = _cache_paths(filepath, cache)
+    stat = filepath.stat()
+    key = {'filepath': str(filepath.resolve()),
+           'size': stat.st_size,
+           'mtime_ns': stat.st_mtime_ns,
+           'options': {k: kwargs[k] for k in ('delimiter', 'comment_flag', 'labels', 'force_array', 'profile')}}
+
+    # cache hit
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        if meta['key'] == key:
+            data = np.load(array_path, mmap_mode='r')
+            os.utime(meta_path)  # least recently used bookkeeping
+            if meta['labels'] is None:
+                return data
+            strings = {label: np.array(meta['strings'][label], dtype=str) for label in meta['strings']}
+            datadict = Dataset._from_block(data, meta['labels'], strings)
+            return datadict if dataset else dict(datadict)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # cache miss
+    result = load_data(filepath, cache=False, dataset=dataset, **kwargs)
+    if meta_path.exists():
+        meta_path.unlink()
+    meta = {'key': key, 'labels': None, 'columns': {}, 'strings': {}}
+    if isinstance(result, dict):
+        meta['labels'] = list(result.keys())
+        columns = []
+        for label in result:
+            if result[label].dtype.kind in 'US':
+                meta['strings'][label] = result[label].tolist()
+            else:
+                meta['columns'][label] = len(columns)
+                columns.append(result[label])
+        # column-major, so each column is contiguous on disk
+        np.save(array_path, np.array(columns, dtype=float))
+    else:
+        np.save(array_path, result)
+    with open(meta_path, 'w') as file:
+        json.dump(meta, file)
+
+    if cache is not True:
+        _evict_cache(meta_path.parent, cache_max_size)
+    return result
+
+
+def _evict_cache(cachedir, max_size):
+    """Remove least recently used cache entries until cachedir is smaller than max_size (bytes)."""
+    entries = []
+    total = 0
+    for meta_path in Path(cachedir).glob('*.json'):
+        array_path = meta_path.with_suffix('.npy')
+        try:
+            size = meta_path.stat().st_size + array_path.stat().st_size
+            entries.append((meta_path.stat().st_mtime, size, meta_path, array_path))
+        except FileNotFoundError:
+            continue
+        total += size
+
+    for _, size, meta_path, array_path in sorted(entries, key=lambda x: x[0]):
+        if total <= max_size:
+            break
+        meta_path.unlink(missing_ok=True)
+        array_path.unlink(missing_ok=True)
+        total -= size
+
+
+def clear_cache(cachedir):
+    """Remove all cache entries created by :py:func:`load_data` in a directory.
+
+    Args:
+        cachedir (str or pathlib.Path): cache directory.
+    """
+    _evict_cache(cachedir, 0)
+
+
+def _file_metadata(filepath, comment_flag='#'):
+    """Return metadata of a text data file for :py:func:`build_catalog`."""
+    with _open(filepath) as file:
+        header, first_line, data_start = _read_header(file, comment_flag=comment_flag)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            profile = _cached_profile(file, header, first_line, comment_flag=comment_flag)
+        delimiter = profile['delimiter']
+        n_cols = profile['n_cols']
+        labels = profile['labels']
+
+    # data lines (binary mode is faster)
+    flag = comment_flag.encode()
+    n_rows = 0
+    with _open(filepath, 'rb') as file:
+        file.seek(data_start)
+        for line in file:
+            if line.strip() and not line.startswith(flag):
+                n_rows += 1
+
+    return {'header': header if header is not False else [],
+            'delimiter': ' ' if delimiter is None else delimiter,
+            'labels': labels if labels is not None else [],
+            'n_rows': n_rows,
+            'n_cols': n_cols}
+
+
+def build_catalog(dirpath='.', catalog=None, string='*', recursive=True, comment_flag='#', max_workers=None):
+    """Create or update a database with metadata of the data files in a folder.
+
+    For each file, the header lines, delimiter, column labels, number of
+    rows and columns (see :py:func:`load_data`), numbers within the filename
+    (see :py:func:`parsed_filelist`), size, and modification time are saved in
+    a SQLite database. Only new or modified files are read when the catalog
+    is updated, and deleted files are removed from the catalog. Files are
+    read in parallel.
+
+    Args:
+        dirpath (str or pathlib.Path, optional): directory path.
+        catalog (str or pathlib.Path, optional): database filepath. Default
+            is ``<dirpath>/.catalog.sqlite``.
+        string (str, optional): string to filter filenames (see :py:func:`filelist`).
+        recursive (bool, optional): if True, subfolders are also scanned.
+        comment_flag (str, optional): string indicating comments.
+        max_workers (int, optional): number of threads reading files. If
+            None, the number of cpus is used.
+
+    Returns:
+        catalog filepath (pathlib.Path).
+
+    See Also:
+        :py:func:`query_catalog`
+    """
+    dirpath = Path(dirpath)
+    catalog = dirpath/'.catalog.sqlite' if catalog is None else Path(catalog)
+    if '*' not in string:
+        string = '*' + string + '*'
+    if max_workers is None:
+        max_workers = os.cpu_count()
+
+    # scan (database and its temporary files are skipped)
+    found = {}
+    catalog_path = os.path.abspath(catalog)
+    stack = [os.path.abspath(dirpath)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if recursive:
+                        stack.append(entry.path)
+                elif fnmatch.fnmatch(entry.name, string) and not entry.path.startswith(catalog_path):
+                    file_stat = entry.stat()
+                    found[entry.path] = (file_stat.st_size, file_stat.st_mtime_ns)
+
+    db = sqlite3.connect(catalog)
+    try:
+        with db:  # commit
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, name TEXT, size INTEGER, mtime_ns INTEGER,
+                                                  delimiter TEXT, n_rows INTEGER, n_cols INTEGER, header TEXT, labels TEXT, error TEXT);
+                CREATE TABLE IF NOT EXISTS labels (path TEXT, label TEXT);
+                CREATE TABLE IF NOT EXISTS numbers (path TEXT, position INTEGER, value REAL);
+                CREATE INDEX IF NOT EXISTS labels_label ON labels (label);
+                CREATE INDEX IF NOT EXISTS labels_path ON labels (path);
+                CREATE INDEX IF NOT EXISTS numbers_value ON numbers (position, value);
+                CREATE INDEX IF NOT EXISTS numbers_path ON numbers (path);
+                """)
+            cataloged = {path: (size, mtime) for path, size, mtime in db.execute('SELECT path, size, mtime_ns FROM files')}
+
+            removed = [path for path in cataloged if path not in found or found[path] != cataloged[path]]
+            new = [path for path in found if path not in cataloged or found[path] != cataloged[path]]
+            for table in ('files', 'labels', 'numbers'):
+                db.executemany(f'DELETE FROM {table} WHERE path = ?', [(path, ) for path in removed])
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(_file_metadata, path, comment_flag): path for path in new}
+                for future in concurrent.futures.as_completed(futures):
+                    path = futures[future]
+                    name = os.path.basename(path)
+                    try:
+                        meta = future.result()
+                        error = None
+                    except Exception as e:
+                        meta = {'header': [], 'delimiter': None, 'labels': [], 'n_rows': None, 'n_cols': None}
+                        error = f'{type(e).__name__}: {e}'
+                    db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (path, name, found[path][0], found[path][1], meta['delimiter'], meta['n_rows'], meta['n_cols'],
+                                ''.join(meta['header']), json.dumps(meta['labels']), error))
+                    db.executemany('INSERT INTO labels VALUES (?, ?)', [(path, label) for label in meta['labels']])
+
+                    numbers = []
+                    for position, n in enumerate(_filename_numbers(name) or []):
+                        try:
+                            numbers.append((path, position, float(n)))
+                        except ValueError:  # e.g., 1,5
+                            pass
+                    db.executemany('INSERT INTO numbers VALUES (?, ?, ?)', numbers)
+    finally:
+        db.close()
+    return catalog
+
+
+def query_catalog(catalog, labels=None, header=None, n_rows=None, n_cols=None, conditions=None, where=None, parameters=()):
+    """Returns a list of files from a catalog that satisfy all given conditions.
+
+    Example:
+        Files with columns 'energy' and 'intensity', 1000 rows, and first
+        filename number between 10 and 50:
+
+        >>> catalog = fm.build_catalog('data')
+        >>> fm.query_catalog(catalog, labels=['energy', 'intensity'], n_rows=1000, conditions={0: (10, 50)})
+
+    Args:
+        catalog (str or pathlib.Path): database filepath (see :py:func:`build_catalog`).
+        labels (str or list, optional): column label(s) that files must have.
+        header (str, optional): text that must be within the file header.
+        n_rows (int or tuple, optional): number of rows, or (min, max).
+        n_cols (int or tuple, optional): number of columns, or (min, max).
+        conditions (dict, optional): conditions on numbers within filenames,
+            ``{position: value}`` or ``{position: (min, max)}``
+            (see :py:func:`query_filelist`).
+        where (str, optional): extra SQL condition on table ``files`` (columns
+            path, name, size, mtime_ns, delimiter, n_rows, n_cols, header,
+            labels, error), e.g., ``'size > ?'``.
+        parameters (tuple, optional): parameters for ``?`` in ``where``.
+
+    Returns:
+        list of filepaths (pathlib.Path) sorted by filepath.
+
+    See Also:
+        :py:func:`build_catalog`
+    """
+    sql = ['SELECT path FROM files WHERE error IS NULL']
+    values = []
+
+    def add_range(column, value):
+        try:
+            start, stop = value
+        except TypeError:
+            start, stop = value, value
+        if start is not None:
+            sql.append(f'AND {column} >= ?')
+            values.append(start)
+        if stop is not None:
+            sql.append(f'AND {column} <= ?')
+            values.append(stop)
+
+    if labels is not None:
+        if isinstance(labels, str):
+            labels = [labels]
+        for label in labels:
+            sql.append('AND path IN (SELECT path FROM labels WHERE label = ?)')
+            values.append(label)
+    if header is not None:
+        sql.append("AND instr(header, ?) > 0")
+        values.append(header)
+    if n_rows is not None:
+        add_range('n_rows', n_rows)
+    if n_cols is not None:
+        add_range('n_cols', n_cols)
+    if conditions is not None:
+        for position in conditions:
+            sql.append('AND path IN (SELECT path FROM numbers WHERE position = ?')
+            values.append(position)
+            add_range('value', conditions[position])
+            sql.append(')')
+    if where is not None:
+        sql.append(f'AND ({where})')
+        values.extend(parameters)
+    sql.append('ORDER BY path')
+
+    db = sqlite3.connect(catalog)
+    try:
+        return [Path(path) for path, in db.execute(' '.join(sql), values)]
+    finally:
+        db.close()
+
+
+_pack_magic = b'BACKPACK'
+
+_pack_indexes = {}
+
+
+def pack(files, filepath, max_workers=None, **kwargs):
+    """Pack many data files in a single indexed file.
+
+    Each data file is parsed (see :py:func:`load_data`) and its arrays and
+    header comments are saved in a single binary file. Arrays of all files
+    are saved one after the other, followed by an index (json), so one file
+    can be loaded (or memory mapped) directly by its filename or the
+    numbers in its filename, and all files can be loaded with a single
+    sequential read (see :py:func:`load_pack`).
+
+    Example:
+        >>> fm.pack('scan_1', 'scan_1.pack')  # all files in folder scan_1
+        >>> fm.pack(fm.parsed_filelist('scan_1', '*.dat'), 'scan_1.pack')
+        >>> data = fm.load_pack('scan_1.pack', 37)   # file with number 37
+        >>> everything = fm.load_pack('scan_1.pack')
+
+    Args:
+        files (str, pathlib.Path, list, or dict): folder path (all regular
+            files that are not hidden), list of filepaths (see
+            :py:func:`filelist`), or dictionary of filepaths (see
+            :py:func:`parsed_filelist`).
+        filepath (str or pathlib.Path): path of the packed file. The file is
+            written to a temporary file which is renamed when done.
+        max_workers (int, optional): number of threads used to parse the
+            files. If None, the number of cpus is used.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Returns:
+        dictionary ``{filepath: reason}`` with the files that could not be
+        parsed (and were not packed).
+
+    See Also:
+        :py:func:`load_pack`, :py:func:`pack_index`, :py:func:`unpack`
+    """
+    if isinstance(files, (str, PurePath)):
+        files = [f for f in filelist(files) if f.is_file() and not f.name.startswith('.')]
+    elif isinstance(files, dict):
+        files = list(files.values())
+    files = [Path(f) for f in files]
+    names = [f.name for f in files]
+    if len(set(names)) != len(names):
+        raise ValueError('Cannot pack files with the same filename (from different folders).')
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    comment_flag = kwargs.get('comment_flag', '#')
+
+    def parse(f):
+        return load_data(f, dataset=True, **kwargs), load_Comments(f, comment_flag=comment_flag)
+
+    index = []
+    skipped = {}
+    filepath = Path(filepath)
+    temp = _temp_path(filepath)
+    try:
+        with open(temp, 'wb') as file:
+            file.write(_pack_magic)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(parse, f) for f in files]
+                for f, future in zip(files, futures):
+                    try:
+                        data, header = future.result()
+                    except Exception as e:
+                        skipped[f] = f'{type(e).__name__}: {e}'
+                        continue
+                    index.append(_pack_entry_write(file, f.name, data, header))
+
+            offset = file.tell()
+            file.write(json.dumps(index).encode())
+            file.write(offset.to_bytes(8, 'little') + _pack_magic)
+        os.replace(temp, filepath)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+
+    for f in skipped:
+        warnings.warn(f'{f} skipped: {skipped[f]}')
+    return skipped
+
+
+def _pack_entry_write(file, name, data, header):
+    """Write arrays of a file to an open pack file and return its index entry (see :py:func:`pack`)."""
+    def write(array):
+        array = np.ascontiguousarray(array)
+        file.write(b'\0'*(-file.tell() % 64))  # aligned arrays
+        offset = file.tell()
+        file.write(array.data if array.size else b'')
+        return [offset, array.dtype.str, list(array.shape)]
+
+    entry = {'name': name,
+             'numbers': _filename_numbers(name),
+             'header': header if header is not False else [],
+             'labels': None,
+             'arrays': {}}
+    if isinstance(data, Dataset):
+        entry['labels'] = list(data.keys())
+        entry['arrays']['block'] = write(data.block)
+        for label in data:
+            if not np.shares_memory(data[label], data.block):
+                entry['arrays'][label] = write(data[label])
+    else:
+        entry['arrays']['data'] = write(data)
+    return entry
+
+
+def pack_index(filepath):
+    """Return the index of a file created by :py:func:`pack`.
+
+    Args:
+        filepath (str or pathlib.Path): path of the packed file.
+
+    Returns:
+        list with one dictionary for each packed file, with keys name,
+        numbers (list of numbers within the filename, as strings), header
+        (list of comment lines), labels (None if data is an array), and
+        arrays (position, dtype, and shape of each array).
+    """
+    return _load_pack_index(filepath)[0]
+
+
+def _load_pack_index(filepath):
+    """Return pack index and a dictionary {name: position}. Indexes are cached by path, size, and modification time."""
+    filepath = Path(filepath)
+    stat_result = filepath.stat()
+    key = (stat_result.st_size, stat_result.st_mtime_ns)
+    path = str(filepath.resolve())
+    if path in _pack_indexes and _pack_indexes[path][0] == key:
+        return _pack_indexes[path][1:]
+
+    with open(filepath, 'rb') as file:
+        if file.read(len(_pack_magic)) != _pack_magic:
+            raise ValueError(f'{filepath} is not a packed file (see pack()).')
+        file.seek(-8 - len(_pack_magic), 2)
+        offset = int.from_bytes(file.read(8), 'little')
+        size = file.tell() - 8 - offset
+        file.seek(offset)
+        index = json.loads(file.read(size))
+
+    names = {entry['name']: i for i, entry in enumerate(index)}
+    _pack_indexes[path] = (key, index, names, {})
+    return index, names, _pack_indexes[path][3]
+
+
+def _pack_entry(entry, array):
+    """Return data of a pack index entry, where array(info) returns each array."""
+    if entry['labels'] is None:
+        return array(entry['arrays']['data'])
+    others = {label: array(info) for label, info in entry['arrays'].items() if label != 'block'}
+    return Dataset._from_block(array(entry['arrays']['block']), entry['labels'], others)
 
-    return datadict
+
+def load_pack(filepath, key=None, ref=0, dataset=False, mmap=True):
+    """Load data from a file created by :py:func:`pack`.
+
+    Args:
+        filepath (str or pathlib.Path): path of the packed file.
+        key (str or number, optional): filename of the file to load, or a
+            number within the filename (see ``ref``). If None, all files are
+            loaded with a single sequential read.
+        ref (int, optional): if key is a number, files are found by their
+            ``ref``-th number in the filename (see :py:func:`parsed_filelist`).
+        dataset (bool, optional): if True, dictionaries are returned as
+            :py:class:`Dataset`.
+        mmap (bool, optional): if True, arrays of a single file are memory
+            mapped instead of read.
+
+    Returns:
+        Data of a file (dictionary or array, see :py:func:`load_data`), or,
+        if key is None, a dictionary ``{filename: data}``.
+
+    See Also:
+        :py:func:`pack`, :py:func:`pack_index`
+    """
+    index, names, numbers = _load_pack_index(filepath)
+
+    def output(data):
+        return dict(data) if isinstance(data, Dataset) and not dataset else data
+
+    if key is None:
+        with open(filepath, 'rb') as file:
+            buffer = bytearray(file.read())
+
+        def array(info):
+            offset, dtype, shape = info
+            return np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        return {entry['name']: output(_pack_entry(entry, array)) for entry in index}
+
+    if isinstance(key, str):
+        if key not in names:
+            raise KeyError(f'{key} not found in {filepath}.')
+        i = names[key]
+    else:
+        if ref not in numbers:
+            numbers[ref] = {}
+            for i, entry in enumerate(index):
+                try:
+                    numbers[ref][float(entry['numbers'][ref])] = i
+                except (TypeError, IndexError, ValueError):  # no number or not a float (e.g., 1.5.2)
+                    pass
+        if float(key) not in numbers[ref]:
+            raise KeyError(f'No file with number {key} in {filepath}.')
+        i = numbers[ref][float(key)]
+
+    with open(filepath, 'rb') as file:
+        def array(info):
+            offset, dtype, shape = info
+            if mmap and 0 not in shape:
+                return np.memmap(file, dtype=dtype, mode='r', offset=offset, shape=tuple(shape))
+            file.seek(offset)
+            return np.fromfile(file, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        return output(_pack_entry(index[i], array))
+
+
+def unpack(filepath, dirpath='.', **kwargs):
+    """Save the files packed by :py:func:`pack` as text files again.
+
+    Header comments are written as they were in the original file, and data
+    is written by :py:func:`save_data` (number formatting may differ from
+    the original file).
+
+    Args:
+        filepath (str or pathlib.Path): path of the packed file.
+        dirpath (str or pathlib.Path, optional): folder where files are saved.
+        **kwargs: arguments passed to :py:func:`save_data` (e.g., data_format
+            and delimiter).
+
+    See Also:
+        :py:func:`pack`
+    """
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+    index = pack_index(filepath)
+    for entry, data in zip(index, load_pack(filepath).values()):
+        save_text(''.join(entry['header']), dirpath/entry['name'])
+        save_data(data, dirpath/entry['name'], append=True, **kwargs)
+
+
+async_max_workers = 8
+"""Number of threads used by the async functions (e.g., :py:func:`load_data_async`)."""
+
+_async_executor = {}
+
+
+def _run_async(function, *args, **kwargs):
+    """Run function in the thread pool of the async functions and return an awaitable.
+
+    The pool is created on first use and has ``async_max_workers`` threads.
+    """
+    if async_max_workers not in _async_executor:
+        for executor in _async_executor.values():
+            executor.shutdown(wait=False)
+        _async_executor.clear()
+        _async_executor[async_max_workers] = concurrent.futures.ThreadPoolExecutor(max_workers=async_max_workers, thread_name_prefix='filemanip')
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_async_executor[async_max_workers], functools.partial(function, *args, **kwargs))
+
+
+async def load_data_async(filepath, **kwargs):
+    """Async version of :py:func:`load_data`.
+
+    The file is loaded in a thread pool (see ``async_max_workers``), so
+    the event loop is not blocked.
+
+    Example:
+        >>> data = await fm.load_data_async('scan_1.dat')
+
+    Args:
+        filepath (str or pathlib.Path): path to file.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Returns:
+        Dictionary or array.
+
+    See Also:
+        :py:func:`load_data_many_async`, :py:func:`iter_loaded_async`
+    """
+    return await _run_async(load_data, filepath, **kwargs)
+
+
+async def save_data_async(obj, filepath='./untitled.txt', **kwargs):
+    """Async version of :py:func:`save_data`. See :py:func:`load_data_async`."""
+    return await _run_async(save_data, obj, filepath, **kwargs)
+
+
+async def load_text_async(filepath, **kwargs):
+    """Async version of :py:func:`load_text`. See :py:func:`load_data_async`."""
+    return await _run_async(load_text, filepath, **kwargs)
+
+
+async def save_text_async(string, filepath='./Untitled.txt', **kwargs):
+    """Async version of :py:func:`save_text`. See :py:func:`load_data_async`."""
+    return await _run_async(save_text, string, filepath, **kwargs)
+
+
+async def load_obj_async(filepath, **kwargs):
+    """Async version of :py:func:`load_obj`. See :py:func:`load_data_async`."""
+    return await _run_async(load_obj, filepath, **kwargs)
+
+
+async def save_obj_async(obj, filepath='./Untitled.txt', **kwargs):
+    """Async version of :py:func:`save_obj`. See :py:func:`load_data_async`."""
+    return await _run_async(save_obj, obj, filepath, **kwargs)
+
+
+async def load_data_many_async(filelist, max_in_flight=None, return_exceptions=False, **kwargs):
+    """Load many data files without blocking the event loop.
+
+    At most ``max_in_flight`` files are loaded at the same time, so many
+    calls can be awaited together (e.g., with ``asyncio.gather``) without
+    flooding the thread pool.
+
+    Example:
+        >>> scans, logs = await asyncio.gather(fm.load_data_many_async(fm.filelist('scans')),
+        ...                                    fm.load_data_many_async(fm.filelist('logs')))
+
+    Args:
+        filelist (list or dict): list of filepaths (see :py:func:`filelist`)
+            or a dictionary of filepaths (see :py:func:`parsed_filelist`).
+        max_in_flight (int, optional): maximum number of files loaded at the
+            same time. If None, ``2*async_max_workers`` is used.
+        return_exceptions (bool, optional): if True, errors are returned in
+            place of the data of a file. If False, the first error is raised.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Returns:
+        list with the data of each file (same order as filelist), or a
+        dictionary if filelist is a dictionary.
+
+    See Also:
+        :py:func:`iter_loaded_async`, :py:func:`load_filelist`
+    """
+    if max_in_flight is None:
+        max_in_flight = 2*async_max_workers
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def load(filepath):
+        async with semaphore:
+            return await _run_async(load_data, filepath, **kwargs)
+
+    filepaths = filelist.values() if isinstance(filelist, dict) else filelist
+    results = await asyncio.gather(*[load(filepath) for filepath in filepaths], return_exceptions=return_exceptions)
+    if isinstance(filelist, dict):
+        return dict(zip(filelist.keys(), results))
+    return results
+
+
+async def save_data_many_async(objs, max_in_flight=None, **kwargs):
+    """Save many data files without blocking the event loop.
+
+    Args:
+        objs (dict): dictionary ``{filepath: obj}`` (see :py:func:`save_data`).
+        max_in_flight (int, optional): maximum number of files saved at the
+            same time. If None, ``2*async_max_workers`` is used.
+        **kwargs: arguments passed to :py:func:`save_data`.
+
+    See Also:
+        :py:func:`load_data_many_async`
+    """
+    if max_in_flight is None:
+        max_in_flight = 2*async_max_workers
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def save(filepath, obj):
+        async with semaphore:
+            return await _run_async(save_data, obj, filepath, **kwargs)
+
+    await asyncio.gather(*[save(filepath, objs[filepath]) for filepath in objs])
+
+
+async def iter_loaded_async(filelist, max_in_flight=None, return_exceptions=False, **kwargs):
+    """Load many data files and yield each one as soon as it is loaded.
+
+    New files are only loaded when there are less than ``max_in_flight``
+    files loaded and not yet consumed, so a slow consumer does not
+    accumulate data in memory (backpressure).
+
+    Example:
+        >>> async for filepath, data in fm.iter_loaded_async(fm.filelist('scans')):
+        ...     await process(data)
+
+    Args:
+        filelist (list or dict): list of filepaths (see :py:func:`filelist`)
+            or a dictionary of filepaths (see :py:func:`parsed_filelist`).
+        max_in_flight (int, optional): maximum number of files loaded at the
+            same time. If None, ``2*async_max_workers`` is used.
+        return_exceptions (bool, optional): if True, errors are yielded in
+            place of the data of a file. If False, the first error is raised.
+        **kwargs: arguments passed to :py:func:`load_data`.
+
+    Yields:
+        filepath (or dictionary key) and data, in the order files are loaded.
+
+    See Also:
+        :py:func:`load_data_many_async`
+    """
+    if max_in_flight is None:
+        max_in_flight = 2*async_max_workers
+    if isinstance(filelist, dict):
+        items = iter(filelist.items())
+    else:
+        items = ((filepath, filepath) for filepath in filelist)
+
+    pending = {}
+    try:
+        while True:
+            for key, filepath in itertools.islice(items, max_in_flight - len(pending)):
+                pending[asyncio.ensure_future(_run_async(load_data, filepath, **kwargs))] = key
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                if future.exception() is not None and return_exceptions:
+                    yield key, future.exception()
+                else:
+                    yield key, future.result()
+    finally:
+        for future in pending:
+            future.cancel()